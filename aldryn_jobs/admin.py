@@ -2,11 +2,26 @@
 
 from __future__ import unicode_literals
 
+import json
+import posixpath
+
 from django.conf import settings
+from django.conf.urls import url
 from django.contrib import admin
-from django.db import models
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import EmptyPage
+from django.core.urlresolvers import reverse
+from django.db import router, transaction
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.signals import post_save, pre_save
+from django.forms.models import BaseInlineFormSet
+from django.http import Http404, HttpResponse
+from django.template.response import TemplateResponse
+from django.utils.encoding import force_text
 from django.utils.safestring import mark_safe
-from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 from adminsortable2.admin import SortableAdminMixin
@@ -23,8 +38,35 @@ from emailit.api import send_mail
 from parler.admin import TranslatableAdmin
 
 
+from .downloads import serve_attachment
+from .exports import (
+    download_attachments_zip,
+    export_applications_csv,
+    export_applications_xlsx,
+)
 from .forms import JobCategoryAdminForm, JobOpeningAdminForm
-from .models import JobApplication, JobCategory, JobOpening, JobsConfig
+from .models import (
+    JobApplication,
+    JobApplicationAttachment,
+    JobCategory,
+    JobOpening,
+    JobsConfig,
+)
+from .ordering import (
+    ORDERING_GAP,
+    get_ordering_between,
+    rebalance_ordering,
+)
+from .paginator import EstimatedCountPaginator
+from .search import search_documents
+from .widgets import AutocompleteSelectMultiple
+
+ADMIN_ESTIMATED_COUNT = getattr(
+    settings, 'ALDRYN_JOBS_ADMIN_ESTIMATED_COUNT', False)
+ADMIN_RECENT_APPLICATIONS = getattr(
+    settings, 'ALDRYN_JOBS_ADMIN_RECENT_APPLICATIONS', 10)
+ADMIN_APPLICATIONS_PER_PAGE = getattr(
+    settings, 'ALDRYN_JOBS_ADMIN_APPLICATIONS_PER_PAGE', 50)
 
 
 def _send_rejection_email(modeladmin, request, queryset, lang_code='',
@@ -44,7 +86,7 @@ def _send_rejection_email(modeladmin, request, queryset, lang_code='',
 
     # 2. update status or delete objects
     if not delete_application:
-        queryset.update(is_rejected=True, rejection_date=now())
+        queryset.reject()
         success_msg = _("Successfully sent {0} rejection email(s).").format(
             qs_count)
     else:
@@ -83,12 +125,215 @@ class SendRejectionEmailAndDelete(SendRejectionEmail):
                               lang_code=self.lang_code, delete_application=True)
 
 
-class JobApplicationAdmin(VersionedPlaceholderAdminMixin, admin.ModelAdmin):
+# Maximum number of results returned by the admin autocomplete views.
+AUTOCOMPLETE_LIMIT = 20
+
+
+def autocomplete_response(results):
+    """
+    Returns a JSON response for the admin autocomplete widgets from a list of
+    (value, label) tuples.
+    """
+    data = {
+        'results': [{'id': force_text(value), 'text': force_text(label)}
+                    for value, label in results],
+    }
+    return HttpResponse(json.dumps(data), content_type='application/json')
+
+
+class EstimatedCountAdminMixin(object):
+    """
+    Uses EstimatedCountPaginator on the changelist if
+    ALDRYN_JOBS_ADMIN_ESTIMATED_COUNT is enabled, and skips the additional
+    unfiltered count Django runs when filters are applied.
+    """
+
+    @property
+    def show_full_result_count(self):
+        return not ADMIN_ESTIMATED_COUNT
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        if ADMIN_ESTIMATED_COUNT:
+            return EstimatedCountPaginator(
+                queryset, per_page, orphans, allow_empty_first_page)
+        return super(EstimatedCountAdminMixin, self).get_paginator(
+            request, queryset, per_page, orphans, allow_empty_first_page)
+
+
+class GapOrderingAdminMixin(object):
+    """
+    Makes SortableAdminMixin keep gaps between ordering values, so moving a
+    row only writes that row instead of shifting every row between its old
+    and new position. When a move finds no gap left, the ordering values are
+    spread out again first, see also the ``rebalance_job_ordering`` command.
+    """
+
+    def get_ordering_queryset(self, request):
+        return self.model.objects.filter(
+            **self.get_extra_model_filters(request))
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            setattr(obj, self.default_order_field,
+                    self.get_max_order(request, obj) + ORDERING_GAP)
+        # skip SortableAdminMixin.save_model, which appends at max + 1
+        super(SortableAdminMixin, self).save_model(request, obj, form, change)
+
+    def _move_item(self, request, startorder, endorder):
+        try:
+            obj = self.get_ordering_queryset(request).get(
+                **{self.default_order_field: startorder})
+        except self.model.MultipleObjectsReturned:
+            raise self.model.MultipleObjectsReturned(
+                "Detected non-unique values in field '{0}' used for sorting "
+                "this model, run the rebalance_job_ordering management "
+                "command to fix them.".format(self.default_order_field))
+        return self._move_after(request, obj, endorder)
+
+    def _move_after(self, request, obj, endorder):
+        """
+        Moves `obj` right behind the rows listed up to the ordering value
+        `endorder` and returns the rows whose ordering changed.
+        """
+        field = self.default_order_field
+        others = self.get_ordering_queryset(request).exclude(pk=obj.pk)
+        if self._get_order_direction(request) == '-1':
+            lookup = {'{0}__gte'.format(field): endorder}
+            upper_qs = others.filter(**lookup)
+            lower_qs = others.exclude(**lookup)
+        else:
+            lookup = {'{0}__lte'.format(field): endorder}
+            lower_qs = others.filter(**lookup)
+            upper_qs = others.exclude(**lookup)
+        # the neighbours of the new position, as (pk, ordering) pairs
+        lower = lower_qs.order_by(
+            '-{0}'.format(field), '-pk').values_list('pk', field).first()
+        upper = upper_qs.order_by(field, 'pk').values_list('pk', field).first()
+
+        current = getattr(obj, field)
+        if all([lower is None or lower[1] < current,
+                upper is None or current < upper[1]]):
+            # already in place
+            return []
+        moved = {}
+        value = get_ordering_between(
+            lower and lower[1], upper and upper[1])
+        if value is None:
+            moved = dict(rebalance_ordering(
+                self.get_ordering_queryset(request), field))
+            value = get_ordering_between(
+                lower and moved.get(lower[0], lower[1]),
+                upper and moved.get(upper[0], upper[1]))
+
+        setattr(obj, field, value)
+        signal_kwargs = {
+            'sender': self.model,
+            'instance': obj,
+            'update_fields': [field],
+            'raw': False,
+            'using': router.db_for_write(self.model, instance=obj),
+        }
+        with transaction.atomic():
+            pre_save.send(**signal_kwargs)
+            self.model.objects.filter(pk=obj.pk).update(**{field: value})
+            post_save.send(created=False, **signal_kwargs)
+        moved[obj.pk] = value
+        return [{'pk': pk, 'order': order} for pk, order in moved.items()]
+
+    def _bulk_move(self, request, queryset, method):
+        if not self.enable_sorting:
+            return
+        field = self.default_order_field
+        objects = self.get_ordering_queryset(request).order_by(self.order_by)
+        paginator = self.paginator(objects, self.list_per_page)
+        page = paginator.page(int(request.GET.get('p', 0)) + 1)
+        step = int(request.POST.get('step', 1))
+        if method == self.EXACT:
+            number = int(request.POST.get('page', page.number))
+        elif method == self.BACK:
+            number = page.number - step
+        elif method == self.FORWARD:
+            number = page.number + step
+        elif method == self.FIRST:
+            number = 1
+        elif method == self.LAST:
+            number = paginator.num_pages
+        else:
+            raise ValueError('Invalid method')
+        try:
+            target = paginator.page(number)
+        except EmptyPage:
+            return
+        if target.number == page.number:
+            return
+
+        # The selected rows are moved in front of the first row of the target
+        # page. They are taken out of the rows preceding it when moving
+        # forward, so that row is `count` rows further down.
+        index = target.start_index() - 1
+        if target.number > page.number:
+            index += queryset.count()
+        anchor = list(objects[index:index + 1].values_list(field, flat=True))
+        descending = self._get_order_direction(request) == '-1'
+        if anchor:
+            endorder = anchor[0] + 1 if descending else anchor[0] - 1
+        else:
+            endorder = objects.reverse().values_list(field, flat=True)[0]
+        for obj in queryset.order_by(self.order_by):
+            self._move_after(request, obj, endorder)
+            endorder = getattr(obj, field)
+
+
+class JobOpeningListFilter(admin.SimpleListFilter):
+    """
+    Filters job applications by job opening without listing every opening in
+    the sidebar. Only the selected opening is loaded; others are searched for
+    through the job opening autocomplete view.
+    """
+    title = _('job opening')
+    parameter_name = 'job_opening'
+    template = 'admin/aldryn_jobs/autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super(JobOpeningListFilter, self).__init__(
+            request, params, model, model_admin)
+        self.autocomplete_url = reverse(
+            'admin:aldryn_jobs_jobapplication_job_opening_autocomplete',
+            current_app=model_admin.admin_site.name)
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        if not self.value():
+            return []
+        try:
+            job_opening = (JobOpening.objects.prefetch_related('translations')
+                                             .get(pk=self.value()))
+        except (JobOpening.DoesNotExist, ValueError, ValidationError):
+            return []
+        return [(force_text(job_opening.pk), force_text(job_opening))]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            return queryset.filter(job_opening=self.value())
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+
+
+class JobApplicationAdmin(EstimatedCountAdminMixin,
+                          VersionedPlaceholderAdminMixin,
+                          admin.ModelAdmin):
+    change_list_template = 'admin/aldryn_jobs/jobapplication/change_list.html'
     list_display = ['__str__', 'job_opening', 'created', 'is_rejected',
                     'rejection_date', ]
-    list_filter = ['job_opening', 'is_rejected']
+    list_filter = [JobOpeningListFilter, 'is_rejected']
     readonly_fields = ['get_attachment_address']
     raw_id_fields = ['job_opening']
+    actions = ['export_as_csv', 'export_as_xlsx', 'download_attachments']
 
     fieldsets = [
         (_('Job Opening'), {
@@ -121,19 +366,109 @@ class JobApplicationAdmin(VersionedPlaceholderAdminMixin, admin.ModelAdmin):
             )
         return actions
 
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            url(r'^(\d+)/attachments/(\d+)/$',
+                self.admin_site.admin_view(self.attachment_view),
+                name='{0}_{1}_attachment'.format(*info)),
+            url(r'^job-openings/autocomplete/$',
+                self.admin_site.admin_view(self.job_opening_autocomplete_view),
+                name='{0}_{1}_job_opening_autocomplete'.format(*info)),
+        ]
+        return urls + super(JobApplicationAdmin, self).get_urls()
+
+    def job_opening_autocomplete_view(self, request):
+        """
+        Returns up to AUTOCOMPLETE_LIMIT job openings for the job opening
+        filter whose search documents (in any language) contain the words of
+        the `q` parameter, looked up through the full-text index of the
+        built-in search.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        term = request.GET.get('q', '').strip()
+        if not term:
+            return autocomplete_response([])
+        pks = (search_documents(term).order_by('-job_opening_id')
+                                     .values_list('job_opening_id', flat=True)
+                                     .distinct()[:AUTOCOMPLETE_LIMIT])
+        job_openings = (JobOpening.objects.filter(pk__in=list(pks))
+                                          .order_by('-pk')
+                                          .select_related('category')
+                                          .prefetch_related(
+                                              'translations',
+                                              'category__translations'))
+        return autocomplete_response(
+            (job_opening.pk, '{0} ({1})'.format(
+                job_opening, job_opening.category))
+            for job_opening in job_openings)
+
+    def attachment_view(self, request, application_id, attachment_id):
+        """
+        Serves an attachment to users who may change its application.
+        """
+        attachments = JobApplicationAttachment.objects.select_related(
+            'application')
+        try:
+            attachment = attachments.get(
+                pk=attachment_id, application=application_id)
+        except JobApplicationAttachment.DoesNotExist:
+            raise Http404
+        if not self.has_change_permission(request, attachment.application):
+            raise PermissionDenied
+        if not attachment.file:
+            raise Http404
+        return serve_attachment(request, attachment)
+
+    def get_queryset(self, request):
+        # job_opening is rendered through its translated __str__
+        qs = super(JobApplicationAdmin, self).get_queryset(request)
+        return qs.select_related('job_opening').prefetch_related(
+            'job_opening__translations')
+
+    def get_object(self, request, object_id, from_field=None):
+        # only the change form lists the attachments, so they are fetched
+        # here rather than for every page of the changelist
+        queryset = self.get_queryset(request).prefetch_related('attachments')
+        model = queryset.model
+        if from_field is None:
+            field = model._meta.pk
+        else:
+            field = model._meta.get_field(from_field)
+        try:
+            return queryset.get(**{field.name: field.to_python(object_id)})
+        except (model.DoesNotExist, ValidationError, ValueError):
+            return None
+
     def has_add_permission(self, request):
         # Don't allow creation of "new" applications via admin-backend until
         # it's properly implemented
         return False
 
+    def export_as_csv(self, request, queryset):
+        return export_applications_csv(request, queryset)
+    export_as_csv.short_description = _('Export selected applications as CSV')
+
+    def export_as_xlsx(self, request, queryset):
+        return export_applications_xlsx(request, queryset)
+    export_as_xlsx.short_description = _(
+        'Export selected applications as XLSX')
+
+    def download_attachments(self, request, queryset):
+        return download_attachments_zip(queryset)
+    download_attachments.short_description = _(
+        'Download attachments of selected applications')
+
     def get_attachment_address(self, instance):
-        attachment_link = '<a href="{address}">{address}</a>'
+        attachment_link = '<a href="{address}">{name}</a>'
         attachments = []
 
         for attachment in instance.attachments.all():
-            if attachment:
-                attachments.append(
-                    attachment_link.format(address=attachment.file.url))
+            if attachment.file:
+                attachments.append(attachment_link.format(
+                    address=attachment.get_download_url(),
+                    name=posixpath.basename(attachment.file.name)))
         return mark_safe('<br>'.join(attachments)) if attachments else '-'
 
     get_attachment_address.allow_tags = True
@@ -141,12 +476,13 @@ class JobApplicationAdmin(VersionedPlaceholderAdminMixin, admin.ModelAdmin):
 
 
 class JobCategoryAdmin(VersionedPlaceholderAdminMixin,
-                       SortableAdminMixin, AllTranslationsMixin,
+                       GapOrderingAdminMixin, SortableAdminMixin,
+                       AllTranslationsMixin,
                        TranslatableAdmin):
     form = JobCategoryAdminForm
     list_display = ['__str__', 'app_config']
-    filter_horizontal = ['supervisors']
     change_list_template = 'admin/aldryn_jobs/change_list.html'
+    supervisor_search_fields = ['email', 'first_name', 'last_name']
 
     def get_fieldsets(self, request, obj=None):
         fieldsets = [
@@ -162,18 +498,103 @@ class JobCategoryAdmin(VersionedPlaceholderAdminMixin,
         ]
         return fieldsets
 
+    def formfield_for_manytomany(self, db_field, request=None, **kwargs):
+        if db_field.name == 'supervisors':
+            kwargs['widget'] = AutocompleteSelectMultiple(reverse(
+                'admin:aldryn_jobs_jobcategory_supervisors_autocomplete',
+                current_app=self.admin_site.name))
+        return super(JobCategoryAdmin, self).formfield_for_manytomany(
+            db_field, request, **kwargs)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            url(r'^supervisors/autocomplete/$',
+                self.admin_site.admin_view(self.supervisors_autocomplete_view),
+                name='{0}_{1}_supervisors_autocomplete'.format(*info)),
+        ]
+        return urls + super(JobCategoryAdmin, self).get_urls()
+
+    def get_supervisor_search_fields(self):
+        user_model = get_user_model()
+        fields = [user_model.USERNAME_FIELD]
+        for field_name in self.supervisor_search_fields:
+            try:
+                user_model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                continue
+            if field_name not in fields:
+                fields.append(field_name)
+        return fields
+
+    def supervisors_autocomplete_view(self, request):
+        """
+        Returns up to AUTOCOMPLETE_LIMIT active users whose username, email or
+        name starts with the `q` parameter. The case-insensitive lookups
+        compile to UPPER(column) LIKE 'TERM%' on PostgreSQL, which plain
+        indexes cannot serve, so large user tables need functional indexes
+        on UPPER() of these columns to avoid a scan.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        term = request.GET.get('q', '').strip()
+        if not term:
+            return autocomplete_response([])
+        user_model = get_user_model()
+        query = Q()
+        for field_name in self.get_supervisor_search_fields():
+            query |= Q(**{'{0}__istartswith'.format(field_name): term})
+        users = user_model._default_manager.filter(query)
+        try:
+            user_model._meta.get_field('is_active')
+        except FieldDoesNotExist:
+            pass
+        else:
+            users = users.filter(is_active=True)
+        users = users.order_by(user_model.USERNAME_FIELD)[:AUTOCOMPLETE_LIMIT]
+        return autocomplete_response((user.pk, user) for user in users)
+
+
+class RecentApplicationsFormSet(BaseInlineFormSet):
+    """
+    Only contains the ADMIN_RECENT_APPLICATIONS most recent applications, the
+    complete list is loaded on demand from `applications_url`.
+    """
+    applications_url = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super(RecentApplicationsFormSet, self).get_queryset()
+            self._queryset = queryset.order_by(
+                '-created', '-pk')[:ADMIN_RECENT_APPLICATIONS]
+        return self._queryset
+
 
 class JobApplicationInline(LinkedRelatedInlineMixin, admin.TabularInline):
     model = JobApplication
+    formset = RecentApplicationsFormSet
     fields = ['email', 'is_rejected', ]
     readonly_fields = ['email', 'is_rejected', ]
+    can_delete = False
+    template = 'admin/aldryn_jobs/jobopening/applications_inline.html'
 
     def has_add_permission(self, request):
         return False
 
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super(JobApplicationInline, self).get_formset(
+            request, obj, **kwargs)
+        if obj is not None and obj.pk:
+            formset.applications_url = reverse(
+                'admin:aldryn_jobs_jobopening_applications', args=(obj.pk,),
+                current_app=self.admin_site.name)
+        return formset
 
-class JobOpeningAdmin(VersionedPlaceholderAdminMixin,
+
+class JobOpeningAdmin(EstimatedCountAdminMixin,
+                      VersionedPlaceholderAdminMixin,
                       AllTranslationsMixin,
+                      GapOrderingAdminMixin,
                       SortableAdminMixin,
                       FrontendEditableAdminMixin,
                       TranslatableAdmin):
@@ -197,10 +618,46 @@ class JobOpeningAdmin(VersionedPlaceholderAdminMixin,
         ]
         return fieldsets
 
-    def get_queryset(self, request):
-        qs = super(JobOpeningAdmin, self).queryset(request)
-        qs = qs.annotate(applications_count=models.Count('applications'))
-        return qs
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            url(r'^(\d+)/applications/$',
+                self.admin_site.admin_view(self.applications_view),
+                name='{0}_{1}_applications'.format(*info)),
+        ]
+        return urls + super(JobOpeningAdmin, self).get_urls()
+
+    def applications_view(self, request, job_opening_id):
+        """
+        Renders one page of the job opening's applications as an HTML
+        fragment, which is appended to the applications inline on demand.
+        """
+        try:
+            job_opening = JobOpening.objects.get(pk=job_opening_id)
+        except JobOpening.DoesNotExist:
+            raise Http404
+        if not self.has_change_permission(request, job_opening):
+            raise PermissionDenied
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        # One extra row tells whether there is a next page without having to
+        # count all applications.
+        offset = (page - 1) * ADMIN_APPLICATIONS_PER_PAGE
+        applications = list(
+            job_opening.applications.order_by('-created', '-pk')
+                                    .only('pk', 'first_name', 'last_name',
+                                          'email', 'created', 'is_rejected')
+            [offset:offset + ADMIN_APPLICATIONS_PER_PAGE + 1])
+        has_next = len(applications) > ADMIN_APPLICATIONS_PER_PAGE
+        request.current_app = self.admin_site.name
+        return TemplateResponse(
+            request, 'admin/aldryn_jobs/jobopening/applications.html', {
+                'opts': JobApplication._meta,
+                'applications': applications[:ADMIN_APPLICATIONS_PER_PAGE],
+                'next_page': page + 1 if has_next else None,
+            })
 
     def num_applications(self, obj):
         return obj.applications_count
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 
 
 class AldrynJobs(AppConfig):
     name = 'aldryn_jobs'
     verbose_name = 'Aldryn Jobs'
+
+    def ready(self):
+        from .models import connect_plugin_signals
+        # plugin models are only all known once the registry is ready
+        connect_plugin_signals(apps.get_models())
@@ -7,7 +7,6 @@ from django.utils.translation import ugettext_lazy as _, ugettext
 
 from cms.api import add_plugin
 from cms.utils import permissions
-from cms.utils.conf import get_cms_setting
 from cms.wizards.wizard_pool import wizard_pool
 from cms.wizards.wizard_base import Wizard
 from cms.wizards.forms import BaseFormMixin
@@ -19,8 +18,9 @@ from parler.forms import TranslatableModelForm
 from reversion.revisions import revision_context_manager
 
 from .cms_appconfig import JobsConfig
+from .forms import group_category_choices
 from .models import JobCategory, JobOpening
-from .utils import namespace_is_apphooked
+from .utils import get_wizard_content_plugin, namespace_is_apphooked
 
 
 class ConfigCheckMixin(object):
@@ -125,8 +125,10 @@ class CreateJobOpeningForm(BaseFormMixin, TranslatableModelForm):
         super(CreateJobOpeningForm, self).__init__(**kwargs)
 
         # If there's only 1 category, don't bother show the empty label (choice)
-        if JobCategory.objects.count() == 1:
+        categories = JobCategory.objects.values_list('pk', flat=True)[:2]
+        if len(categories) == 1:
             self.fields['category'].empty_label = None
+        group_category_choices(self.fields['category'])
         self.fields['publication_start'].help_text = _(
             'Date Acceptable Formats: 2015-11-30, 11/30/2015, 11/30/15')
         self.fields['publication_end'].help_text = _(
@@ -139,19 +141,7 @@ class CreateJobOpeningForm(BaseFormMixin, TranslatableModelForm):
         # it to the PlaceholderField
         content = clean_html(self.cleaned_data.get('content', ''), False)
 
-        try:
-            # CMS >= 3.3.x
-            content_plugin = get_cms_setting('PAGE_WIZARD_CONTENT_PLUGIN')
-        except KeyError:
-            # CMS <= 3.2.x
-            content_plugin = get_cms_setting('WIZARD_CONTENT_PLUGIN')
-
-        try:
-            # CMS >= 3.3.x
-            content_field = get_cms_setting('PAGE_WIZARD_CONTENT_PLUGIN_BODY')
-        except KeyError:
-            # CMS <= 3.2.x
-            content_field = get_cms_setting('WIZARD_CONTENT_PLUGIN_BODY')
+        content_plugin, content_field = get_wizard_content_plugin()
 
         if content and permissions.has_plugin_permission(
                 self.user, content_plugin, 'add'):
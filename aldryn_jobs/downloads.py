@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import mimetypes
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import urlquote
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^\s*bytes=(\d*)-(\d*)\s*$')
+
+
+def get_sendfile_backend():
+    """
+    Returns the configured front-end server offload ('x-accel-redirect',
+    'x-sendfile') or None.
+    """
+    backend = getattr(settings, 'ALDRYN_JOBS_ATTACHMENT_SENDFILE', None)
+    return backend.lower() if backend else None
+
+
+def parse_range_header(header, size):
+    """
+    Parses a single byte range of an HTTP Range header. Returns a (start, end)
+    tuple with inclusive offsets, None if the header should be ignored, or
+    False if the range can not be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        # Missing, malformed and multi-range headers are served in full.
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last `end` bytes.
+        length = int(end)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _iter_file(field_file, start, length):
+    try:
+        field_file.open('rb')
+        field_file.seek(start)
+        while length > 0:
+            data = field_file.read(min(DOWNLOAD_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        field_file.close()
+
+
+def _ranged_file_response(request, field_file, content_type):
+    size = field_file.size
+    byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416, content_type=content_type)
+        response['Content-Range'] = 'bytes */{0}'.format(size)
+        return response
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status = 206
+    length = max(end - start + 1, 0)
+    response = StreamingHttpResponse(
+        _iter_file(field_file, start, length),
+        status=status, content_type=content_type)
+    response['Content-Length'] = str(length)
+    if status == 206:
+        response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(
+            start, end, size)
+    return response
+
+
+def serve_attachment(request, attachment):
+    """
+    Returns a response delivering the file of a JobApplicationAttachment.
+
+    If ALDRYN_JOBS_ATTACHMENT_SENDFILE is set, the transfer is handed to the
+    front-end server with an X-Accel-Redirect (nginx) or X-Sendfile (Apache,
+    lighttpd) header. Otherwise the file is streamed in chunks, honouring
+    single-range HTTP Range requests.
+    """
+    field_file = attachment.file
+    filename = posixpath.basename(field_file.name)
+    content_type, __ = mimetypes.guess_type(filename)
+    content_type = content_type or 'application/octet-stream'
+    backend = get_sendfile_backend()
+
+    if backend == 'x-accel-redirect':
+        prefix = getattr(
+            settings, 'ALDRYN_JOBS_ATTACHMENT_ACCEL_REDIRECT_PREFIX',
+            '/protected/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = urlquote(
+            posixpath.join(prefix, field_file.name))
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = field_file.path
+    else:
+        response = _ranged_file_response(request, field_file, content_type)
+        response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = 'attachment; filename="{0}"'.format(
+        filename.replace('"', ''))
+    return response
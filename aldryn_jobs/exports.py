@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import csv
+import logging
+import posixpath
+import re
+
+from django.http import StreamingHttpResponse
+from django.utils import six, timezone
+from django.utils.encoding import force_text
+from django.utils.html import escape
+from django.utils.translation import ugettext as _
+
+from .models import JobApplicationAttachment, JobOpening
+from .utils import get_valid_filename
+from .zipstream import ZipStream
+
+logger = logging.getLogger(__name__)
+
+# Number of applications fetched per query while exporting.
+EXPORT_BATCH_SIZE = 1000
+
+XLSX_CONTENT_TYPE = (
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+# Leading characters that make spreadsheet applications read a cell as a
+# formula.
+FORMULA_CHARS = ('=', '+', '-', '@', '\t', '\r')
+
+# Characters that are not allowed in XML 1.0 documents.
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_STATIC_FILES = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+     'content-types">'
+     '<Default Extension="rels" ContentType="application/'
+     'vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" ContentType="application/'
+     'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="'
+     'application/vnd.openxmlformats-officedocument.spreadsheetml.'
+     'worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+     'relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+     'officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/'
+     'main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+     'relationships">'
+     '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+     'relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+     'officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/>'
+     '</Relationships>'),
+)
+
+
+def get_application_export_header():
+    return [
+        _('ID'), _('Created'), _('Salutation'), _('First name'),
+        _('Last name'), _('Email'), _('Job opening'), _('Category'),
+        _('Status'), _('Rejection date'), _('Cover letter'),
+        _('Attachments'),
+    ]
+
+
+def _format_datetime(value):
+    if value is None:
+        return ''
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime('%Y-%m-%d %H:%M')
+
+
+def escape_formula(value):
+    """
+    Returns `value` prefixed with an apostrophe if a spreadsheet application
+    would read it as a formula, so values entered by applicants can not run
+    formulas on the computers of the staff opening the export.
+    """
+    if value.startswith(FORMULA_CHARS):
+        return "'" + value
+    return value
+
+
+def _iter_batches(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields lists of objects from the queryset, fetched in batches of
+    `batch_size` rows with keyset pagination on the primary key, so neither
+    the database driver nor Python holds the whole result in memory.
+    """
+    queryset = queryset.order_by('-pk')
+    last_pk = None
+    while True:
+        batch_qs = queryset
+        if last_pk is not None:
+            batch_qs = batch_qs.filter(pk__lt=last_pk)
+        batch = list(batch_qs[:batch_size].iterator())
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def iter_application_rows(queryset, request):
+    """
+    Yields the export rows (lists of strings) of the job applications in
+    `queryset`, newest first.
+    """
+    # Openings and categories are few compared to applications, so their
+    # translated names are looked up once and kept for the whole export.
+    opening_names = {}
+    for applications in _iter_batches(queryset):
+        missing = set(application.job_opening_id
+                      for application in applications) - set(opening_names)
+        if missing:
+            job_openings = (JobOpening.objects.filter(pk__in=missing)
+                                              .select_related('category')
+                                              .prefetch_related(
+                                                  'translations',
+                                                  'category__translations'))
+            for job_opening in job_openings:
+                opening_names[job_opening.pk] = (
+                    force_text(job_opening), force_text(job_opening.category))
+
+        attachment_urls = {}
+        attachments = JobApplicationAttachment.objects.filter(
+            application__in=[application.pk for application in applications]
+        ).order_by('pk')
+        for attachment in attachments.iterator():
+            if attachment.file:
+                url = request.build_absolute_uri(
+                    attachment.get_download_url())
+                attachment_urls.setdefault(
+                    attachment.application_id, []).append(url)
+
+        for application in applications:
+            title, category = opening_names.get(
+                application.job_opening_id, ('', ''))
+            yield [
+                force_text(application.pk),
+                _format_datetime(application.created),
+                force_text(application.get_salutation_display()),
+                application.first_name,
+                application.last_name,
+                application.email,
+                title,
+                category,
+                _('rejected') if application.is_rejected else _('pending'),
+                _format_datetime(application.rejection_date),
+                application.cover_letter,
+                '\n'.join(attachment_urls.get(application.pk, [])),
+            ]
+
+
+class Echo(object):
+    """
+    A file-like object that returns what is written to it, used to stream
+    the output of csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    # Lets spreadsheet applications detect the encoding.
+    yield '\ufeff'.encode('utf-8')
+    for row in rows:
+        if six.PY2:
+            yield writer.writerow(
+                [escape_formula(value).encode('utf-8') for value in row])
+        else:
+            yield writer.writerow(
+                [escape_formula(value) for value in row]).encode('utf-8')
+
+
+def _get_column_letter(idx):
+    letters = ''
+    idx += 1
+    while idx:
+        idx, remainder = divmod(idx - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def iter_xlsx_sheet(rows):
+    yield ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           '<worksheet xmlns="http://schemas.openxmlformats.org/'
+           'spreadsheetml/2006/main"><sheetData>').encode('utf-8')
+    for row_idx, row in enumerate(rows, start=1):
+        cells = []
+        for col_idx, value in enumerate(row):
+            cells.append(
+                '<c r="{0}{1}" t="inlineStr"><is>'
+                '<t xml:space="preserve">{2}</t></is></c>'.format(
+                    _get_column_letter(col_idx), row_idx,
+                    escape(ILLEGAL_XML_CHARS.sub('', escape_formula(value)))))
+        yield '<row r="{0}">{1}</row>'.format(
+            row_idx, ''.join(cells)).encode('utf-8')
+    yield '</sheetData></worksheet>'.encode('utf-8')
+
+
+def iter_xlsx(rows):
+    """
+    Yields an XLSX workbook with a single sheet holding `rows`. Cells are
+    written as inline strings, so no shared strings table has to be built in
+    memory.
+    """
+    archive = ZipStream()
+    for name, content in XLSX_STATIC_FILES:
+        for data in archive.add(name, [content.encode('utf-8')]):
+            yield data
+    for data in archive.add('xl/worksheets/sheet1.xml', iter_xlsx_sheet(rows)):
+        yield data
+    for data in archive.close():
+        yield data
+
+
+def _export_response(content, content_type, extension):
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = 'job-applications-{0}.{1}'.format(
+        timezone.now().strftime('%Y%m%d-%H%M'), extension)
+    response['Content-Disposition'] = 'attachment; filename="{0}"'.format(
+        filename)
+    return response
+
+
+def _iter_export_rows(request, queryset):
+    yield [force_text(title) for title in get_application_export_header()]
+    for row in iter_application_rows(queryset, request):
+        yield row
+
+
+def export_applications_csv(request, queryset):
+    """
+    Returns a streaming response with the job applications as CSV.
+    """
+    rows = _iter_export_rows(request, queryset)
+    return _export_response(
+        iter_csv(rows), 'text/csv; charset=utf-8', 'csv')
+
+
+def export_applications_xlsx(request, queryset):
+    """
+    Returns a streaming response with the job applications as XLSX.
+    """
+    rows = _iter_export_rows(request, queryset)
+    return _export_response(iter_xlsx(rows), XLSX_CONTENT_TYPE, 'xlsx')
+
+
+def get_application_folder_name(application):
+    return get_valid_filename('{0}-{1}-{2}'.format(
+        application.pk, application.last_name, application.first_name))
+
+
+def iter_attachments_zip(queryset):
+    """
+    Yields a ZIP archive with the attachments of the job applications in
+    `queryset`, one folder per application. Files are read from storage in
+    chunks while the archive is written.
+    """
+    archive = ZipStream()
+    for applications in _iter_batches(queryset):
+        applications = dict(
+            (application.pk, application) for application in applications)
+        attachments = JobApplicationAttachment.objects.filter(
+            application__in=list(applications)).order_by('pk')
+        used_names = set()
+        for attachment in attachments.iterator():
+            if not attachment.file:
+                continue
+            application = applications[attachment.application_id]
+            folder = get_application_folder_name(application)
+            filename = posixpath.basename(attachment.file.name)
+            name = posixpath.join(folder, filename)
+            idx = 1
+            while name in used_names:
+                root, ext = posixpath.splitext(filename)
+                name = posixpath.join(
+                    folder, '{0}-{1}{2}'.format(root, idx, ext))
+                idx += 1
+            used_names.add(name)
+
+            created = application.created
+            if timezone.is_aware(created):
+                created = timezone.localtime(created)
+            try:
+                attachment.file.open('rb')
+            except (IOError, OSError):
+                logger.exception(
+                    'Could not open attachment %s.', attachment.file.name)
+                continue
+            try:
+                for data in archive.add(name, attachment.file.chunks(),
+                                        created.timetuple()):
+                    yield data
+            finally:
+                attachment.file.close()
+    for data in archive.close():
+        yield data
+
+
+def download_attachments_zip(queryset):
+    """
+    Returns a streaming response with a ZIP archive of the attachments of the
+    job applications.
+    """
+    response = StreamingHttpResponse(
+        iter_attachments_zip(queryset), content_type='application/zip')
+    filename = 'job-application-attachments-{0}.zip'.format(
+        timezone.now().strftime('%Y%m%d-%H%M'))
+    response['Content-Disposition'] = 'attachment; filename="{0}"'.format(
+        filename)
+    return response
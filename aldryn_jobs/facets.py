@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Facets of the job opening list: filter parameters with the number of
+openings for each of their values.
+
+The counts of a facet are computed by one grouped query over the openings
+matching the other facets and the search query. Without a search query they
+are cached per namespace, language and filter state until jobs data changes
+(see aldryn_jobs.utils.invalidate_cache) or an opening gets (un)published.
+Counts for a search query are not cached: the queries are unbounded and the
+search documents change without invalidating the cache.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.encoding import force_bytes, force_text
+from django.utils.translation import ugettext_lazy as _
+
+from .models import JobCategory, JobOpening
+from .utils import get_cache_key
+
+FACET_CACHE_TIMEOUT = getattr(
+    settings, 'ALDRYN_JOBS_FACET_CACHE_TIMEOUT', 60 * 60)
+
+
+class Facet(object):
+    """
+    A filter parameter of the job opening list. By default the GET parameter
+    `name` selects values of the opening field `field`, which are also the
+    labels of the choices; subclasses override filter() and get_choices() to
+    select by other values.
+    """
+    name = None
+    label = None
+    field = None
+
+    def get_selected(self, request):
+        """Returns the sorted values of this facet selected in `request`."""
+        return sorted(set(value for value in request.GET.getlist(self.name)
+                          if value))
+
+    def filter(self, queryset, selected, language):
+        """Narrows `queryset` to the openings with one of the `selected`."""
+        return queryset.filter(**{'{0}__in'.format(self.field): selected})
+
+    def get_choices(self, queryset, namespace, language):
+        """
+        Returns a list of (value, label, count) tuples, counting the openings
+        of `queryset` per value.
+        """
+        counts = queryset.facet_counts(self.field)
+        return [(force_text(value), force_text(value), count)
+                for value, count in sorted(counts.items())
+                if value is not None]
+
+
+class CategoryFacet(Facet):
+    """Filters the openings by the slugs of their categories."""
+    name = 'category'
+    label = _('Category')
+
+    def filter(self, queryset, selected, language):
+        return queryset.filter(
+            category__translations__language_code=language,
+            category__translations__slug__in=selected)
+
+    def get_choices(self, queryset, namespace, language):
+        counts = queryset.facet_counts('category')
+        categories = (
+            JobCategory.objects
+                       .namespace(namespace)
+                       .language(language)
+                       .active_translations(language)
+                       .filter(pk__in=list(counts))
+                       .order_by('ordering')
+        )
+        return [(category.slug, category.name, counts[category.pk])
+                for category in categories]
+
+
+def get_facet_choices(facets, queryset, selected, namespace, language,
+                      query=''):
+    """
+    Returns a list of (facet, choices) pairs, where choices are (value,
+    label, count, is_selected) tuples. The counts of each facet take the
+    selection of the other facets and the search `query` into account, but
+    not its own, so further values can be added to the selection.
+    `queryset` holds the openings before any facet filter is applied and
+    `selected` maps the facet names to their selected values.
+    """
+    facet_choices = []
+    for facet in facets:
+        if query:
+            cache_key = choices = None
+        else:
+            state = [[other.name, selected[other.name]]
+                     for other in facets if other is not facet]
+            cache_key = get_cache_key(
+                'facets', facet.name, namespace, language,
+                hashlib.sha1(force_bytes(json.dumps(state))).hexdigest())
+            choices = cache.get(cache_key)
+        if choices is None:
+            facet_queryset = queryset
+            for other in facets:
+                if other is not facet and selected[other.name]:
+                    facet_queryset = other.filter(
+                        facet_queryset, selected[other.name], language)
+            choices = facet.get_choices(facet_queryset, namespace, language)
+            if cache_key:
+                cache.set(cache_key, choices, JobOpening.objects.namespace(
+                    namespace).publication_cache_timeout(
+                        FACET_CACHE_TIMEOUT))
+        facet_choices.append((facet, [
+            (value, label, count, value in selected[facet.name])
+            for value, label, count in choices]))
+    return facet_choices
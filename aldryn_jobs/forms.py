@@ -4,6 +4,8 @@ from __future__ import unicode_literals
 
 import os
 import logging
+from itertools import groupby
+from operator import attrgetter
 
 from django import forms
 from django.db.models import Q
@@ -13,11 +15,12 @@ from django.core.exceptions import (
     ImproperlyConfigured,
 )
 from django.core.urlresolvers import reverse
+from django.forms.models import ModelChoiceIterator
+from django.utils.encoding import force_text
 from django.utils.translation import ugettext
 
 from aldryn_apphooks_config.utils import setup_config
 from app_data import AppDataForm
-from cms.models import Page
 from emailit.api import send_mail
 from multiupload.fields import MultiFileField
 from parler.forms import TranslatableModelForm
@@ -25,7 +28,7 @@ from parler.forms import TranslatableModelForm
 from .models import (
     JobApplication, JobApplicationAttachment, JobCategory, JobOpening,
     JobsConfig, JobListPlugin, JobCategoriesPlugin)
-from .utils import namespace_is_apphooked
+from .utils import get_apphooked_namespaces, namespace_is_apphooked
 
 SEND_ATTACHMENTS_WITH_EMAIL = getattr(
     settings, 'ALDRYN_JOBS_SEND_ATTACHMENTS_WITH_EMAIL', True)
@@ -46,6 +49,37 @@ class AutoAppConfigFormMixin(object):
                 self.fields['app_config'].empty_label = None
 
 
+class CategoryChoiceIterator(ModelChoiceIterator):
+    """
+    Iterates the choices of a job category ModelChoiceField grouped by app
+    config, fetching the configs and translations with the categories
+    instead of once per option.
+    """
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        categories = (self.queryset.select_related('app_config')
+                                   .prefetch_related('translations')
+                                   .order_by('app_config__pk', 'ordering'))
+        for app_config, group in groupby(categories,
+                                         key=attrgetter('app_config')):
+            choices = [self.choice(category) for category in group]
+            if app_config is None:
+                for choice in choices:
+                    yield choice
+            else:
+                yield (force_text(app_config), choices)
+
+
+def group_category_choices(field):
+    """
+    Renders the options of the job category `field` as optgroups per app
+    config.
+    """
+    field.widget.choices = CategoryChoiceIterator(field)
+
+
 class JobCategoryAdminForm(AutoAppConfigFormMixin, TranslatableModelForm):
 
     class Meta:
@@ -83,14 +117,8 @@ class JobOpeningAdminForm(TranslatableModelForm):
     def __init__(self, *args, **kwargs):
         super(JobOpeningAdminForm, self).__init__(*args, **kwargs)
 
-        # small monkey patch to show better label for categories
-        def label_from_instance(category_object):
-            return "{0} / {1}".format(
-                category_object.app_config,
-                category_object
-            )
         try:
-            self.fields['category'].label_from_instance = label_from_instance
+            group_category_choices(self.fields['category'])
         except KeyError:
             # When the form is invoked by the render_model template tag with a
             # list of explicitly set fields, category might not be present.
@@ -223,26 +251,22 @@ class AppConfigPluginFormMixin(object):
                          'not provided.'))
 
         super(AppConfigPluginFormMixin, self).__init__(*args, **kwargs)
-        # get available event configs, that have the same namespace
-        # as pages with namespaces. that will ensure that user wont
+        # get available configs, that is the configs whose namespace is
+        # apphooked to a published page. that will ensure that user wont
         # select config that is not app hooked because that
         # will lead to a 500 error until that config wont be used.
-        available_configs = self.config_model.objects.filter(
-            namespace__in=Page.objects.exclude(
-                application_namespace__isnull=True).values_list(
-                'application_namespace', flat=True))
-
-        published_configs_pks = [
-            config.pk for config in available_configs
-            if namespace_is_apphooked(config.namespace)]
-
-        self.fields['app_config'].queryset = available_configs.filter(
+        apphooked_namespaces = get_apphooked_namespaces()
+        published_configs_pks = []
+        not_published = []
+        for pk, namespace in self.config_model.objects.values_list(
+                'pk', 'namespace'):
+            if namespace in apphooked_namespaces:
+                published_configs_pks.append(pk)
+            else:
+                not_published.append(namespace)
+
+        self.fields['app_config'].queryset = self.config_model.objects.filter(
             pk__in=published_configs_pks)
-        # inform user that there are not published namespaces
-        # which he shouldn't use
-        not_published = self.config_model.objects.exclude(
-            pk__in=published_configs_pks).values_list(
-            'namespace', flat=True)
 
         # prepare help messages
         msg_not_published = ugettext(
@@ -253,8 +277,9 @@ class AppConfigPluginFormMixin(object):
         not_published_namespaces = '; '.join(not_published)
 
         additional_message = None
-        if not_published.count() > 0:
-            # prepare message with list of not published configs.
+        if not_published:
+            # inform user that there are not published namespaces
+            # which he shouldn't use
             additional_message = '{0}\n<br/>{1}'.format(
                 msg_not_published, not_published_namespaces)
 
@@ -264,8 +289,8 @@ class AppConfigPluginFormMixin(object):
                 additional_message)
 
         # pre select app config if there is only one option
-        if self.fields['app_config'].queryset.count() == 1:
-                self.fields['app_config'].empty_label = None
+        if len(published_configs_pks) == 1:
+            self.fields['app_config'].empty_label = None
 
     def clean_app_config(self):
         # since namespace is not a unique thing we need to validate it
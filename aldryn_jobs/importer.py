@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import csv
+import hashlib
+import io
+import json
+import os
+from datetime import datetime, time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import six, timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.encoding import force_text
+
+from cms.api import add_plugin
+from cms.models import CMSPlugin
+from djangocms_text_ckeditor.html import clean_html
+from reversion.models import Revision, Version
+from reversion.revisions import default_revision_manager
+
+from .cms_appconfig import JobsConfig
+from .models import JobCategory, JobOpening
+from .ordering import ORDERING_GAP
+from .utils import get_wizard_content_plugin, invalidate_cache
+
+IMPORT_BATCH_SIZE = getattr(settings, 'ALDRYN_JOBS_IMPORT_BATCH_SIZE', 500)
+
+TRANSLATED_FIELDS = ('category', 'title', 'slug', 'lead_in', 'content')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+
+
+def iter_csv_records(fileobj):
+    """
+    Yields the rows of a CSV file with a header row as dicts. `fileobj` is
+    expected to be opened in binary mode on Python 2 and in text mode on
+    Python 3.
+    """
+    for row in csv.DictReader(fileobj):
+        if six.PY2:
+            row = dict((force_text(key), force_text(value or ''))
+                       for key, value in row.items())
+        yield row
+
+
+def iter_json_records(fileobj):
+    """
+    Yields the records of a JSON Lines file, one JSON object per line.
+    """
+    for line in fileobj:
+        line = force_text(line).strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_records(path, file_format=None):
+    """
+    Yields the records of a CSV or JSON Lines file. Unless `file_format` is
+    given ('csv' or 'json') it is guessed from the file extension.
+    """
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        file_format = 'csv' if extension == '.csv' else 'json'
+    if file_format == 'csv' and six.PY2:
+        fileobj = open(path, 'rb')
+    else:
+        fileobj = io.open(path, encoding='utf-8-sig', newline='')
+    with fileobj:
+        if file_format == 'csv':
+            records = iter_csv_records(fileobj)
+        else:
+            records = iter_json_records(fileobj)
+        for record in records:
+            yield record
+
+
+def _to_bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return force_text(value).strip().lower() in TRUE_VALUES
+
+
+def _to_datetime(value):
+    if not value:
+        return None
+    value = force_text(value).strip()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError('Invalid date "{0}".'.format(value))
+        parsed = datetime.combine(date, time())
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+    return parsed
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class JobOpeningImporter(object):
+    """
+    Bulk creates job openings, and if needed their categories, from records
+    (dicts). Translated values are given either in `<field>_<language>` keys,
+    as CSV columns are, or as {language: value} dicts:
+
+        {"app_config": "jobs", "category": {"en": "Engineering"},
+         "title_en": "Software Engineer", "content_en": "<p>...</p>"}
+
+    Plain strings are taken to be in the first language of LANGUAGES. The
+    optional `slug` defaults to a slug of the title, `content` becomes a text
+    plugin in the opening's content placeholder and `external_id` identifies
+    the opening for `sync()`. All objects are saved in one transaction and one
+    revision, in batches of `batch_size` records.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, user=None,
+                 comment='Imported job openings.'):
+        self.batch_size = batch_size
+        self.user = user
+        self.comment = comment
+        self.languages = [code for code, name in settings.LANGUAGES]
+        self.app_configs = dict(
+            (app_config.namespace, app_config)
+            for app_config in JobsConfig.objects.all())
+        self.content_plugin, self.content_field = get_wizard_content_plugin()
+        # (app_config.pk, language, name) -> category pk
+        self.categories = {}
+        self.loaded_app_configs = set()
+        # (app_config.pk, language) -> set of taken opening slugs
+        self.slugs = {}
+        self.versioned = set()
+        # model -> last ordering value given out
+        self.orderings = {}
+        self.revision = None
+        self.created_categories = 0
+        self.created_openings = 0
+        self.updated_openings = 0
+        self.unchanged_openings = 0
+        self.deactivated_openings = 0
+
+    def get_revision(self):
+        if self.revision is None:
+            self.revision = Revision.objects.create(
+                manager_slug=default_revision_manager._manager_slug,
+                user=self.user, comment=self.comment)
+        return self.revision
+
+    def iter_batches(self, records, external_ids=None):
+        """
+        Yields the records normalized and validated in batches. Raises
+        ValueError, naming the record, for invalid records. If a set of
+        `external_ids` is given, the records must have a unique external ID,
+        which is added to the set.
+        """
+        offset = 0
+        for batch in _batches(records, self.batch_size):
+            normalized = []
+            for index, record in enumerate(batch, offset + 1):
+                try:
+                    record = self.normalize(record)
+                    if external_ids is not None:
+                        external_id = record['external_id']
+                        if not external_id:
+                            raise ValueError('An external_id is required.')
+                        if external_id in external_ids:
+                            raise ValueError('Duplicate external_id '
+                                             '"{0}".'.format(external_id))
+                        external_ids.add(external_id)
+                    normalized.append(record)
+                except ValueError as error:
+                    raise ValueError('Record {0}: {1}'.format(index, error))
+            offset += len(batch)
+            yield normalized
+
+    def run(self, records):
+        """
+        Imports `records` and returns the number of created job openings.
+        Raises ValueError, naming the record, for invalid records.
+        """
+        with transaction.atomic():
+            self.get_revision()
+            for batch in self.iter_batches(records):
+                self.import_rows([self.prepare(record) for record in batch])
+        if self.created_openings:
+            # bulk_create() sends no signals
+            invalidate_cache()
+        return self.created_openings
+
+    def sync(self, records, deactivate_missing=False):
+        """
+        Creates or updates the job openings identified by the `external_id`
+        of the records. Openings whose record did not change since the last
+        sync are not written at all. With `deactivate_missing`, active
+        openings with an external ID that is not among the records are
+        deactivated.
+        """
+        seen = set()
+        with transaction.atomic():
+            for batch in self.iter_batches(records, external_ids=seen):
+                existing = dict(
+                    (external_id, (pk, external_hash))
+                    for external_id, pk, external_hash
+                    in JobOpening.objects.filter(external_id__in=[
+                        record['external_id'] for record in batch
+                    ]).values_list('external_id', 'pk', 'external_hash'))
+                new_rows = []
+                changed = {}
+                for record in batch:
+                    if record['external_id'] not in existing:
+                        new_rows.append(self.prepare(record))
+                        continue
+                    pk, external_hash = existing[record['external_id']]
+                    if external_hash == record['hash']:
+                        self.unchanged_openings += 1
+                    else:
+                        changed[pk] = record
+                if new_rows:
+                    self.import_rows(new_rows)
+                if changed:
+                    self.update_openings(changed)
+            if deactivate_missing:
+                self.deactivate_openings(seen)
+        if any([self.created_openings, self.updated_openings,
+                self.deactivated_openings]):
+            # bulk_create() and update() send no signals
+            invalidate_cache()
+
+    def normalize(self, record):
+        """
+        Returns the record with all translated values as {language: value}
+        dicts, its `hash`, its resolved `app_config` and the `values` of the
+        untranslated fields of its opening.
+        """
+        normalized = {}
+        for field in TRANSLATED_FIELDS:
+            value = record.get(field)
+            if isinstance(value, dict):
+                values = dict(value)
+            elif value:
+                values = {self.languages[0]: value}
+            else:
+                values = {}
+            for language in self.languages:
+                key = '{0}_{1}'.format(field, language)
+                if record.get(key):
+                    values[language] = record[key]
+            normalized[field] = dict(
+                (language, force_text(value))
+                for language, value in values.items() if value)
+        for field in ('app_config', 'is_active', 'can_apply',
+                      'publication_start', 'publication_end'):
+            value = record.get(field)
+            normalized[field] = value if value is None else force_text(value)
+        normalized['external_id'] = force_text(
+            record.get('external_id') or '').strip() or None
+        normalized['hash'] = hashlib.sha1(json.dumps(
+            normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+        if not normalized['title']:
+            raise ValueError('A title is required.')
+        app_config = self.get_app_config(normalized['app_config'])
+        normalized['app_config'] = app_config
+        normalized['values'] = {
+            'category_id': self.get_category(
+                app_config, normalized['category']),
+            'is_active': _to_bool(normalized['is_active'], True),
+            'can_apply': _to_bool(normalized['can_apply'], True),
+            'publication_start': _to_datetime(
+                normalized['publication_start']),
+            'publication_end': _to_datetime(normalized['publication_end']),
+        }
+        return normalized
+
+    def prepare(self, record):
+        """
+        Returns the unsaved job opening for the normalized `record` together
+        with its translated values and content by language.
+        """
+        opening = JobOpening(
+            external_id=record['external_id'],
+            external_hash=record['hash'] if record['external_id'] else '',
+            **record['values'])
+        translations = {}
+        for language, title in record['title'].items():
+            translations[language] = {
+                'title': title,
+                'slug': self.get_slug(record['app_config'], language, title,
+                                      record['slug'].get(language)),
+                'lead_in': record['lead_in'].get(language, ''),
+            }
+        return opening, translations, record['content']
+
+    def get_app_config(self, namespace):
+        if not namespace:
+            if len(self.app_configs) == 1:
+                return list(self.app_configs.values())[0]
+            raise ValueError('An app_config namespace is required.')
+        try:
+            return self.app_configs[namespace]
+        except KeyError:
+            raise ValueError('Unknown app_config "{0}".'.format(namespace))
+
+    def get_category(self, app_config, names):
+        """
+        Returns the pk of the category of `app_config` with any of the given
+        translated names, creating the category if there is none.
+        """
+        if not names:
+            raise ValueError('A category is required.')
+        if app_config.pk not in self.loaded_app_configs:
+            translations = JobCategory._parler_meta.root_model.objects.filter(
+                master__app_config=app_config)
+            for pk, language, name in translations.values_list(
+                    'master_id', 'language_code', 'name'):
+                self.categories[(app_config.pk, language, name)] = pk
+            self.loaded_app_configs.add(app_config.pk)
+        for language, name in names.items():
+            pk = self.categories.get((app_config.pk, language, name))
+            if pk is not None:
+                return pk
+        category = JobCategory(app_config=app_config,
+                               ordering=self.get_next_ordering(JobCategory))
+        for language, name in names.items():
+            category.set_current_language(language)
+            category.name = name
+            category.save()
+        for language, name in names.items():
+            self.categories[(app_config.pk, language, name)] = category.pk
+        self.created_categories += 1
+        return category.pk
+
+    def get_next_ordering(self, model):
+        """
+        Returns an ordering value ORDERING_GAP after the last one of `model`,
+        so imported rows keep distinct, gap-spaced values like rows added in
+        the admin.
+        """
+        if model not in self.orderings:
+            self.orderings[model] = model.objects.aggregate(
+                last=Max('ordering'))['last'] or 0
+        self.orderings[model] += ORDERING_GAP
+        return self.orderings[model]
+
+    def get_slug(self, app_config, language, title, slug=None):
+        """
+        Returns `slug`, or a slug of `title`, made unique among the openings
+        of `app_config` in `language`.
+        """
+        key = (app_config.pk, language)
+        if key not in self.slugs:
+            translations = JobOpening._parler_meta.root_model.objects.filter(
+                master__category__app_config=app_config,
+                language_code=language)
+            self.slugs[key] = set(translations.values_list('slug', flat=True))
+        taken = self.slugs[key]
+        opening = JobOpening()
+        opening.set_current_language(language)
+        if not slug:
+            opening.title = title
+            slug = opening._get_ideal_slug()
+        candidate = opening._get_free_slug(slug, taken.__contains__)
+        taken.add(candidate)
+        return candidate
+
+    def import_rows(self, rows):
+        openings = [opening for opening, translations, content in rows]
+        for opening in openings:
+            opening.ordering = self.get_next_ordering(JobOpening)
+        # The content placeholders are created by PlaceholderField.pre_save,
+        # which also sets content_id on the instances. Openings only get their
+        # pks back from bulk_create on some databases, so map them by their
+        # unique placeholder.
+        JobOpening.objects.bulk_create(openings)
+        pks = dict(JobOpening.objects.filter(
+            content__in=[opening.content_id for opening in openings],
+        ).values_list('content_id', 'pk'))
+        translation_model = JobOpening._parler_meta.root_model
+        translation_objects = []
+        for opening, translations, content in rows:
+            opening.pk = pks[opening.content_id]
+            for language, values in translations.items():
+                translation_objects.append(translation_model(
+                    master_id=opening.pk, language_code=language, **values))
+            for language, text in content.items():
+                text = clean_html(text, False)
+                if text:
+                    add_plugin(opening.content, self.content_plugin,
+                               language, **{self.content_field: text})
+        translation_model.objects.bulk_create(translation_objects)
+        self.add_versions(openings)
+        self.created_openings += len(openings)
+
+    def update_openings(self, records):
+        """
+        Updates the openings with the given pks from the normalized records,
+        a {pk: record} dict. Existing slugs are kept unless the record has
+        another one, content is only replaced in the languages the record
+        has content for.
+        """
+        openings = JobOpening.objects.filter(
+            pk__in=list(records)).prefetch_related('translations')
+        for opening in openings:
+            record = records[opening.pk]
+            for field, value in record['values'].items():
+                setattr(opening, field, value)
+            opening.external_hash = record['hash']
+            languages = opening.get_available_languages()
+            for language, title in record['title'].items():
+                opening.set_current_language(language)
+                slug = record['slug'].get(language)
+                if language not in languages:
+                    slug = self.get_slug(
+                        record['app_config'], language, title, slug)
+                elif slug and slug != opening.slug:
+                    slug = self.get_slug(
+                        record['app_config'], language, title, slug)
+                else:
+                    slug = opening.slug
+                opening.title = title
+                opening.slug = slug
+                opening.lead_in = record['lead_in'].get(language, '')
+            opening.save()
+            for language, text in record['content'].items():
+                for plugin in opening.content.get_plugins(language).filter(
+                        parent__isnull=True):
+                    plugin.delete()
+                text = clean_html(text, False)
+                if text:
+                    add_plugin(opening.content, self.content_plugin,
+                               language, **{self.content_field: text})
+            self.updated_openings += 1
+        self.add_versions(openings)
+
+    def deactivate_openings(self, external_ids):
+        """
+        Deactivates the active openings that have an external ID, but none of
+        `external_ids`.
+        """
+        missing = [
+            pk for pk, external_id in JobOpening.objects.filter(
+                external_id__isnull=False, is_active=True,
+            ).values_list('pk', 'external_id')
+            if external_id not in external_ids]
+        for offset in range(0, len(missing), self.batch_size):
+            openings = JobOpening.objects.filter(
+                pk__in=missing[offset:offset + self.batch_size])
+            for opening in openings:
+                opening.is_active = False
+                opening.save()
+                self.deactivated_openings += 1
+            self.add_versions(openings)
+
+    def add_versions(self, openings):
+        """
+        Adds the versions of `openings`, the objects they follow and their
+        plugins to the import's revision.
+        """
+        manager = default_revision_manager
+        objects = list(manager._follow_relationships(
+            JobOpening.objects.filter(
+                pk__in=[opening.pk for opening in openings])))
+        plugins = CMSPlugin.objects.filter(placeholder__in=[
+            opening.content_id for opening in openings])
+        for plugin in plugins:
+            plugin_instance, _ = plugin.get_plugin_instance()
+            if plugin_instance:
+                objects.append(plugin_instance)
+            objects.append(plugin)
+        versions = []
+        for obj in objects:
+            key = (obj.__class__, obj.pk)
+            if key in self.versioned or not manager.is_registered(
+                    obj.__class__):
+                continue
+            self.versioned.add(key)
+            versions.append(Version(
+                revision=self.get_revision(),
+                **manager.get_adapter(obj.__class__).get_version_data(obj)))
+        Version.objects.bulk_create(versions)
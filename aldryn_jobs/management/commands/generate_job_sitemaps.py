@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import time
+
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import NoReverseMatch, reverse
+from django.utils import timezone
+
+from ...models import JOBS_CHANGED_WATERMARK, JobOpening, Watermark
+from ...sitemaps.files import INDEX_FILENAME, write_sitemaps
+
+# Name of the watermark of the time the sitemaps were last written at.
+WATERMARK = 'generate_job_sitemaps'
+
+
+def jobs_changed_since(since):
+    """
+    Tells whether jobs data changed or an opening got (un)published since
+    `since`.
+    """
+    if since is None:
+        return True
+    changed = Watermark.objects.get_value(JOBS_CHANGED_WATERMARK)
+    if changed is not None and changed > since:
+        return True
+    return JobOpening.objects.changed_since(since).exists()
+
+
+class Command(BaseCommand):
+    help = ('Writes the jobs sitemaps and their index as gzip-compressed '
+            'files to the storage, for aldryn_jobs.sitemaps.urls to serve.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--if-changed', action='store_true', default=False,
+            dest='if_changed',
+            help='Only write the files if jobs data changed or an opening '
+                 'got (un)published since they were last written.')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running, checking for changes every this many '
+                 'seconds. Implies --if-changed.')
+        parser.add_argument(
+            '--protocol', default='http',
+            help='Protocol of the URLs in the sitemaps (default: http).')
+        parser.add_argument(
+            '--base-path',
+            help='Path the sitemap files are served at, by default the one '
+                 'of aldryn_jobs.sitemaps.urls.')
+
+    def handle(self, *args, **options):
+        base_path = options['base_path']
+        if base_path is None:
+            try:
+                base_path = reverse('aldryn-jobs-sitemap', kwargs={
+                    'filename': INDEX_FILENAME})[:-len(INDEX_FILENAME)]
+            except NoReverseMatch:
+                raise CommandError(
+                    'aldryn_jobs.sitemaps.urls is not included in the URLs, '
+                    'use --base-path.')
+
+        while True:
+            if options['if_changed'] or options['interval']:
+                self.write_if_changed(base_path, options)
+            else:
+                self.write(base_path, options)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def write_if_changed(self, base_path, options):
+        if not jobs_changed_since(Watermark.objects.get_value(WATERMARK)):
+            self.stdout.write('The sitemaps are up to date.')
+            return
+        self.write(base_path, options)
+
+    def write(self, base_path, options):
+        # take the time before generating, so changes made meanwhile are
+        # written by the next run
+        started = timezone.now()
+        count = write_sitemaps(Site.objects.get_current(), base_path,
+                               protocol=options['protocol'])
+        Watermark.objects.set_value(WATERMARK, started)
+        self.stdout.write('Wrote {0} sitemap file(s).'.format(count))
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import translation
+
+from ...importer import IMPORT_BATCH_SIZE, JobOpeningImporter, read_records
+
+
+class Command(BaseCommand):
+    help = ('Imports job openings from a CSV or JSON Lines file, creating '
+            'missing categories. Everything is saved in one revision.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['csv', 'json'], default=None,
+            help='Format of the file, by default guessed from its extension.')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Number of records saved at a time.')
+        parser.add_argument(
+            '--comment', default='Imported job openings.',
+            help='Comment of the revision.')
+
+    def handle(self, *args, **options):
+        importer = JobOpeningImporter(
+            batch_size=options['batch_size'], comment=options['comment'])
+        records = read_records(options['path'], options['format'])
+        try:
+            with translation.override(settings.LANGUAGE_CODE):
+                importer.run(records)
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            'Imported {0} job opening(s) and created {1} category(ies).'
+            .format(importer.created_openings, importer.created_categories))
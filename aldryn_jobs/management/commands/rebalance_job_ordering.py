@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from ...models import JobCategory, JobOpening
+from ...ordering import ORDERING_GAP, needs_rebalancing, rebalance_ordering
+from ...utils import invalidate_cache
+
+
+class Command(BaseCommand):
+    help = ('Spreads the ordering values of job categories and job openings '
+            'apart again, so reordering them in the admin keeps updating a '
+            'single row. Meant to be run periodically, e.g. from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-gap', type=int, default=2,
+            help='Rebalance when two neighbouring rows are closer than this '
+                 '(default: 2, i.e. only when no gap is left).')
+        parser.add_argument(
+            '--force', action='store_true', default=False,
+            help='Rebalance even if there is enough room between all rows.')
+
+    def handle(self, *args, **options):
+        for model in (JobCategory, JobOpening):
+            queryset = model.objects.all()
+            name = model._meta.verbose_name_plural
+            if not options['force'] and not needs_rebalancing(
+                    queryset, min_gap=options['min_gap']):
+                self.stdout.write('The ordering of {0} has enough room.'.format(
+                    name))
+                continue
+            updated = rebalance_ordering(queryset, gap=ORDERING_GAP)
+            if updated:
+                invalidate_cache()
+            self.stdout.write('Rebalanced the ordering of {0} {1}.'.format(
+                len(updated), name))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import translation
+
+from ...importer import IMPORT_BATCH_SIZE, JobOpeningImporter, read_records
+
+
+class Command(BaseCommand):
+    help = ('Creates or updates job openings by their external_id from a CSV '
+            'or JSON Lines file. Unchanged openings are not written.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['csv', 'json'], default=None,
+            help='Format of the file, by default guessed from its extension.')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Number of records saved at a time.')
+        parser.add_argument(
+            '--deactivate-missing', action='store_true', default=False,
+            help='Deactivate job openings with an external_id that is not '
+                 'in the file.')
+        parser.add_argument(
+            '--comment', default='Synced job openings.',
+            help='Comment of the revision.')
+
+    def handle(self, *args, **options):
+        importer = JobOpeningImporter(
+            batch_size=options['batch_size'], comment=options['comment'])
+        records = read_records(options['path'], options['format'])
+        try:
+            with translation.override(settings.LANGUAGE_CODE):
+                importer.sync(records, options['deactivate_missing'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            'Created {0}, updated {1}, deactivated {2} and skipped {3} '
+            'unchanged job opening(s).'.format(
+                importer.created_openings, importer.updated_openings,
+                importer.deactivated_openings, importer.unchanged_openings))
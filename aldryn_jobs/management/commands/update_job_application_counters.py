@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from ...models import JobOpening
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the denormalized application counters of all job '
+            'openings from the applications table.')
+
+    def handle(self, *args, **options):
+        updated = JobOpening.objects.refresh_application_counters()
+        self.stdout.write(
+            'Updated application counters of {0} job opening(s).'.format(
+                updated))
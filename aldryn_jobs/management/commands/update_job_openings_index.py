@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import time
+from datetime import timedelta
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections as db_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ...models import DeletedJobOpening, JobOpening, Watermark
+from ...search import update_search_documents
+
+# Name of the watermark of the time up to which the index was last updated,
+# kept in the database so an evicted cache does not cause a full reindex.
+WATERMARK = 'update_job_openings_index'
+
+
+def update_batch(task):
+    """
+    Updates the job openings with the given primary keys in the index of the
+    search connection `using`, or removes those that do not belong in it.
+    With `using` None, the built-in search documents are rebuilt instead.
+    Returns (using, updated, removed). Defined at module level so it can be
+    run by the worker processes.
+    """
+    using, pks = task
+    if using is None:
+        updated = update_search_documents(JobOpening.objects.filter(pk__in=pks))
+        return using, updated, len(pks) - updated
+
+    from haystack import connections
+
+    opts = JobOpening._meta
+    index = connections[using].get_unified_index().get_index(JobOpening)
+    backend = connections[using].get_backend()
+    objects = list(index.index_queryset(using=using).filter(pk__in=pks))
+    if objects:
+        backend.update(index, objects)
+    removed = set(pks) - set(obj.pk for obj in objects)
+    for pk in removed:
+        backend.remove('{0}.{1}.{2}'.format(
+            opts.app_label, opts.model_name, pk))
+    return using, len(objects), len(removed)
+
+
+class Command(BaseCommand):
+    help = ('Updates the built-in search documents and the search index '
+            'for the job openings that were modified, published or '
+            'unpublished since the last run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Update the openings changed since this ISO 8601 date and '
+                 'time, instead of since the last run.')
+        parser.add_argument(
+            '--all', action='store_true', default=False, dest='all',
+            help='Update all job openings.')
+        parser.add_argument(
+            '--using', action='append', default=[],
+            help='Update the given search connection only, can be repeated. '
+                 'By default all connections are updated.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of openings sent to the search backend at a time.')
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Number of worker processes preparing and sending the '
+                 'batches in parallel. By default the batches are handled '
+                 'in this process.')
+        parser.add_argument(
+            '--delay', type=int, default=0,
+            help='Leave openings changed within this many seconds for the '
+                 'next run, so that repeated edits are indexed once.')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running, updating the index every this many seconds.')
+        parser.add_argument(
+            '--margin', type=int, default=300,
+            help='Also update the openings changed within this many seconds '
+                 'before the last run, which may have been saved by '
+                 'transactions that were not committed yet (default: 300).')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('Invalid --since date and time.')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        elif not options['all']:
+            since = Watermark.objects.get_value(WATERMARK)
+
+        while True:
+            # Leave openings changed within the last --delay seconds for the
+            # next pass, so a burst of edits is indexed once.
+            until = timezone.now() - timedelta(seconds=options['delay'])
+            self.update(since, until, options)
+            if not options['since']:
+                Watermark.objects.set_value(WATERMARK, until)
+            if not options['since'] and not options['using']:
+                # the next run starts reading deletions after this
+                overlap = until - timedelta(seconds=options['margin'])
+                DeletedJobOpening.objects.filter(
+                    deleted__lte=overlap).delete()
+            if not options['interval']:
+                break
+            since = until
+            time.sleep(options['interval'])
+
+    def update(self, since, until, options):
+        """
+        Updates the index for the openings changed between `since` (or ever)
+        and `until`.
+        """
+        openings = JobOpening.objects.all()
+        deletions = DeletedJobOpening.objects.filter(deleted__lte=until)
+        if since is not None:
+            # modified is stamped before the saving transaction commits, so
+            # the windows overlap to catch openings committed late
+            since -= timedelta(seconds=options['margin'])
+            openings = openings.changed_since(since, until=until)
+            deletions = deletions.filter(deleted__gt=since)
+        pks = set(openings.values_list('pk', flat=True))
+        # deleted openings are not found, so update_batch removes them
+        pks.update(deletions.values_list('job_opening_id', flat=True))
+        pks = sorted(pks)
+
+        tasks = self.get_tasks(pks, self.get_connections(options), options)
+        if options['workers'] > 1 and len(tasks) > 1:
+            # the workers must not share the database connection
+            db_connections.close_all()
+            pool = Pool(options['workers'])
+            try:
+                results = list(pool.imap_unordered(update_batch, tasks))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [update_batch(task) for task in tasks]
+
+        totals = {}
+        for using, updated, removed in results:
+            total = totals.setdefault(using, [0, 0])
+            total[0] += updated
+            total[1] += removed
+        for using, (updated, removed) in sorted(
+                totals.items(), key=lambda item: item[0] or ''):
+            self.stdout.write(
+                '{0}: updated {1} and removed {2} job opening(s).'.format(
+                    using or 'search documents', updated, removed))
+
+    def get_tasks(self, pks, connections_to_update, options):
+        """
+        Splits the work into (using, pks) tasks for update_batch(), one per
+        search connection (i.e. language) and range of --batch-size pks.
+        """
+        size = options['batch_size']
+        return [(using, pks[offset:offset + size])
+                for using in connections_to_update
+                for offset in range(0, len(pks), size)]
+
+    def get_connections(self, options):
+        """
+        Returns the search connections to update, None standing for the
+        built-in search documents. Those are always updated, the haystack
+        connections only when django-haystack is installed.
+        """
+        connections_to_update = [None]
+        try:
+            from haystack import connections
+            from haystack.exceptions import NotHandled
+        except ImportError:
+            if options['using']:
+                raise CommandError('django-haystack is not installed.')
+            return connections_to_update
+        for using in options['using'] or list(connections.connections_info):
+            try:
+                connections[using].get_unified_index().get_index(JobOpening)
+            except NotHandled:
+                continue
+            connections_to_update.append(using)
+        return connections_to_update
@@ -2,7 +2,12 @@
 
 from __future__ import unicode_literals
 
-from django.db.models import Q
+import math
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Min, Q, When
+from django.db.models.query import QuerySet
 from django.utils import timezone
 
 from parler.managers import TranslatableManager, TranslatableQuerySet
@@ -21,6 +26,54 @@ class JobOpeningsQuerySet(TranslatableQuerySet):
     def namespace(self, namespace):
         return self.filter(category__app_config__namespace=namespace)
 
+    def changed_since(self, since, until=None):
+        """
+        Returns the openings that were last modified, or got published or
+        unpublished, after `since` and until `until` (by default now).
+        Openings modified again after `until` are left for the next window.
+        """
+        until = until or timezone.now()
+        changed = Q(modified__gt=since, modified__lte=until)
+        changed |= Q(publication_start__gt=since, publication_start__lte=until)
+        changed |= Q(publication_end__gt=since, publication_end__lte=until)
+        return self.filter(changed)
+
+    def facet_counts(self, field):
+        """
+        Returns {value of `field`: number of openings} for the openings of
+        this queryset, computed by a single grouped query.
+        """
+        return dict(self.order_by().values_list(field).annotate(
+            count=Count('pk', distinct=True)))
+
+    def next_publication_change(self):
+        """
+        Returns the next time one of the active openings gets published or
+        unpublished, or None if there is no such change scheduled.
+        """
+        now = timezone.now()
+        changes = self.filter(is_active=True).aggregate(
+            start=Min(Case(When(publication_start__gt=now,
+                                then='publication_start'),
+                           output_field=models.DateTimeField())),
+            end=Min(Case(When(publication_end__gt=now,
+                              then='publication_end'),
+                         output_field=models.DateTimeField())),
+        )
+        changes = [change for change in changes.values() if change]
+        return min(changes) if changes else None
+
+    def publication_cache_timeout(self, timeout):
+        """
+        Returns `timeout` (in seconds), shortened so that data cached with it
+        expires when one of the openings gets published or unpublished.
+        """
+        change = self.next_publication_change()
+        if change is not None:
+            seconds = (change - timezone.now()).total_seconds()
+            timeout = min(timeout, max(int(math.ceil(seconds)), 1))
+        return timeout
+
 
 class JobOpeningsManager(TranslatableManager):
 
@@ -32,3 +85,117 @@ class JobOpeningsManager(TranslatableManager):
 
     def namespace(self, namespace):
         return self.get_queryset().namespace(namespace)
+
+    def changed_since(self, since, until=None):
+        return self.get_queryset().changed_since(since, until)
+
+    def update_application_counters(self, job_opening_id, pending=0,
+                                    rejected=0):
+        """
+        Atomically adjusts the application counters of a job opening by the
+        given (possibly negative) amounts of pending and rejected
+        applications.
+        """
+        if not pending and not rejected:
+            return 0
+        return self.get_queryset().filter(pk=job_opening_id).update(
+            applications_count=F('applications_count') + pending + rejected,
+            pending_applications_count=(
+                F('pending_applications_count') + pending),
+            rejected_applications_count=(
+                F('rejected_applications_count') + rejected),
+        )
+
+    def refresh_application_counters(self, pks=None):
+        """
+        Recomputes the application counters from the applications table and
+        stores them on every job opening (or only the ones in `pks`) whose
+        counters are out of date. Returns the number of updated openings.
+        """
+        from .models import JobApplication
+
+        applications = JobApplication.objects.all()
+        openings = self.get_queryset()
+        if pks is not None:
+            applications = applications.filter(job_opening__in=pks)
+            openings = openings.filter(pk__in=pks)
+
+        counters = defaultdict(lambda: [0, 0])
+        rows = (applications.order_by()
+                            .values_list('job_opening', 'is_rejected')
+                            .annotate(count=Count('pk')))
+        for job_opening_id, is_rejected, count in rows:
+            counters[job_opening_id][int(is_rejected)] += count
+
+        updated = 0
+        with transaction.atomic():
+            stored = openings.order_by().values_list(
+                'pk', 'pending_applications_count',
+                'rejected_applications_count', 'applications_count')
+            for pk, pending, rejected, total in stored:
+                actual_pending, actual_rejected = counters[pk]
+                if (pending, rejected, total) == (
+                        actual_pending, actual_rejected,
+                        actual_pending + actual_rejected):
+                    continue
+                self.get_queryset().filter(pk=pk).update(
+                    applications_count=actual_pending + actual_rejected,
+                    pending_applications_count=actual_pending,
+                    rejected_applications_count=actual_rejected,
+                )
+                updated += 1
+        return updated
+
+
+class JobApplicationQuerySet(QuerySet):
+
+    def reject(self):
+        """
+        Marks the applications as rejected and keeps the application counters
+        of their job openings in sync. Returns the number of updated rows.
+        """
+        from .models import JobOpening
+
+        with transaction.atomic():
+            newly_rejected = (
+                self.filter(is_rejected=False)
+                    .order_by()
+                    .values_list('job_opening')
+                    .annotate(count=Count('pk'))
+            )
+            for job_opening_id, count in newly_rejected:
+                JobOpening.objects.update_application_counters(
+                    job_opening_id, pending=-count, rejected=count)
+            return self.update(is_rejected=True, rejection_date=timezone.now())
+
+
+class JobApplicationManager(models.Manager):
+
+    def get_queryset(self):
+        return JobApplicationQuerySet(self.model, using=self.db)
+
+    def reject(self):
+        return self.get_queryset().reject()
+
+
+class WatermarkQuerySet(QuerySet):
+
+    def get_value(self, name):
+        """Returns the time stored as `name`, or None if there is none."""
+        return self.filter(name=name).values_list(
+            'value', flat=True).first()
+
+    def set_value(self, name, value):
+        self.update_or_create(name=name, defaults={'value': value})
+
+
+class WatermarkManager(models.Manager):
+
+    def get_queryset(self):
+        return WatermarkQuerySet(self.model, using=self.db)
+
+    def get_value(self, name):
+        return self.get_queryset().get_value(name)
+
+    def set_value(self, name, value):
+        return self.get_queryset().set_value(name, value)
@@ -2,21 +2,42 @@
 
 from __future__ import unicode_literals
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.urlresolvers import NoReverseMatch
 from django.utils.translation import ugettext_lazy as _
 
 from cms.menu_bases import CMSAttachMenu
 from cms.utils import get_language_from_request
+from cms.utils.conf import get_cms_setting
 from menus.base import NavigationNode
 from menus.menu_pool import menu_pool
 
 from .models import JobCategory
 from .models import JobOpening
+from .utils import get_cache_key
 
+MENU_CACHE_TIMEOUT = getattr(
+    settings, 'ALDRYN_JOBS_MENU_CACHE_TIMEOUT',
+    get_cms_setting('CACHE_DURATIONS')['menus'])
 
-class JobCategoryMenu(CMSAttachMenu):
 
-    name = _("Job Categories Menu")
+class CachedNodesMixin(object):
+    """
+    Caches the nodes of the menu per namespace and language. The cache is
+    invalidated when jobs data changes, see aldryn_jobs.utils.invalidate_cache.
+    Subclasses override get_node_data() to list their nodes.
+    """
+
+    def get_node_data(self, app_namespace, language):
+        """
+        Returns a list of (title, url, id) or (title, url, id, parent_id)
+        tuples for the nodes of the menu, none by default.
+        """
+        return []
+
+    def get_cache_timeout(self, app_namespace, language):
+        return MENU_CACHE_TIMEOUT
 
     def get_nodes(self, request):
         try:
@@ -24,7 +45,22 @@ class JobCategoryMenu(CMSAttachMenu):
         except AttributeError:
             app_namespace = None
         language = get_language_from_request(request)
-        nodes = []
+        cache_key = get_cache_key(
+            'menu', self.__class__.__name__, app_namespace, language)
+        node_data = cache.get(cache_key)
+        if node_data is None:
+            node_data = self.get_node_data(app_namespace, language)
+            cache.set(cache_key, node_data,
+                      self.get_cache_timeout(app_namespace, language))
+        return [NavigationNode(*data) for data in node_data]
+
+
+class JobCategoryMenu(CachedNodesMixin, CMSAttachMenu):
+
+    name = _("Job Categories Menu")
+
+    def get_node_data(self, app_namespace, language):
+        node_data = []
         categories = (
             JobCategory.objects
                        .namespace(app_namespace)
@@ -33,28 +69,20 @@ class JobCategoryMenu(CMSAttachMenu):
         )
         for category in categories:
             try:
-                node = NavigationNode(category.name,
-                                      category.get_absolute_url(),
-                                      category.slug)
-                nodes.append(node)
+                node_data.append((category.name,
+                                  category.get_absolute_url(),
+                                  category.slug))
             except NoReverseMatch:
                 pass
-        return nodes
+        return node_data
 
 
-class JobOpeningMenu(CMSAttachMenu):
+class JobOpeningMenu(CachedNodesMixin, CMSAttachMenu):
 
     name = _("Job Openings Menu")
 
-    def get_nodes(self, request):
-
-        try:
-            app_namespace = self.instance.application_namespace
-        except AttributeError:
-            app_namespace = None
-
-        current_language = get_language_from_request(request)
-        nodes = []
+    def get_node_data(self, app_namespace, current_language):
+        node_data = []
         openings = (
             JobOpening.objects
                       .active()
@@ -64,17 +92,74 @@ class JobOpeningMenu(CMSAttachMenu):
         )
         for job_opening in openings:
             try:
-                node = NavigationNode(
-                    title=job_opening.title,
-                    url=job_opening.get_absolute_url(),
-                    id=job_opening.pk,
-                )
+                node_data.append((job_opening.title,
+                                  job_opening.get_absolute_url(),
+                                  job_opening.pk))
+            except NoReverseMatch:
+                pass
+        return node_data
+
+    def get_cache_timeout(self, app_namespace, language):
+        # expire the nodes when an opening gets published or unpublished
+        timeout = super(JobOpeningMenu, self).get_cache_timeout(
+            app_namespace, language)
+        return JobOpening.objects.namespace(
+            app_namespace).publication_cache_timeout(timeout)
+
+
+class JobCategoryOpeningMenu(JobOpeningMenu):
+    """
+    Lists the active job openings nested under their categories. Categories,
+    openings and their translations are fetched with four queries, however
+    many there are.
+    """
+
+    name = _("Job Categories and Openings Menu")
+
+    def get_node_data(self, app_namespace, language):
+        node_data = []
+        categories = (
+            JobCategory.objects
+                       .namespace(app_namespace)
+                       .language(language)
+                       .active_translations(language)
+                       .select_related('app_config')
+                       .prefetch_related('translations')
+        )
+        categories_by_pk = {}
+        for category in categories:
+            try:
+                node_data.append((category.name,
+                                  category.get_absolute_url(),
+                                  'category-{0}'.format(category.pk)))
+            except NoReverseMatch:
+                continue
+            categories_by_pk[category.pk] = category
+
+        openings = (
+            JobOpening.objects
+                      .active()
+                      .namespace(app_namespace)
+                      .language(language)
+                      .active_translations(language)
+                      .prefetch_related('translations')
+        )
+        for job_opening in openings:
+            category = categories_by_pk.get(job_opening.category_id)
+            if category is None:
+                continue
+            # reuse the fetched category, with its app config and translations
+            job_opening.category = category
+            try:
+                node_data.append((job_opening.title,
+                                  job_opening.get_absolute_url(),
+                                  'opening-{0}'.format(job_opening.pk),
+                                  'category-{0}'.format(category.pk)))
             except NoReverseMatch:
                 pass
-            else:
-                nodes.append(node)
-        return nodes
+        return node_data
 
 
 menu_pool.register_menu(JobCategoryMenu)
 menu_pool.register_menu(JobOpeningMenu)
+menu_pool.register_menu(JobCategoryOpeningMenu)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+def populate_application_counters(apps, schema_editor):
+    JobApplication = apps.get_model('aldryn_jobs', 'JobApplication')
+    JobOpening = apps.get_model('aldryn_jobs', 'JobOpening')
+
+    counters = defaultdict(lambda: [0, 0])
+    rows = (JobApplication.objects.order_by()
+                                  .values_list('job_opening', 'is_rejected')
+                                  .annotate(count=models.Count('pk')))
+    for job_opening_id, is_rejected, count in rows:
+        counters[job_opening_id][int(is_rejected)] += count
+
+    for job_opening_id, (pending, rejected) in counters.items():
+        JobOpening.objects.filter(pk=job_opening_id).update(
+            applications_count=pending + rejected,
+            pending_applications_count=pending,
+            rejected_applications_count=rejected,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_jobs', '0003_auto_20160714_1512'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobopening',
+            name='applications_count',
+            field=models.IntegerField(default=0, verbose_name='applications', db_index=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='jobopening',
+            name='pending_applications_count',
+            field=models.IntegerField(default=0, verbose_name='pending applications', editable=False),
+        ),
+        migrations.AddField(
+            model_name='jobopening',
+            name='rejected_applications_count',
+            field=models.IntegerField(default=0, verbose_name='rejected applications', editable=False),
+        ),
+        migrations.RunPython(populate_application_counters, noop),
+    ]
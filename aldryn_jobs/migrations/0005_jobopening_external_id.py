@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_jobs', '0004_jobopening_application_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobopening',
+            name='external_id',
+            field=models.CharField(help_text='Identifies the opening in an external system.', max_length=255, unique=True, null=True, verbose_name='external ID', blank=True),
+        ),
+        migrations.AddField(
+            model_name='jobopening',
+            name='external_hash',
+            field=models.CharField(default='', verbose_name='external hash', max_length=40, editable=False, blank=True),
+        ),
+    ]
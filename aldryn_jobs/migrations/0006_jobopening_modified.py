@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_jobs', '0005_jobopening_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobopening',
+            name='modified',
+            field=models.DateTimeField(default=django.utils.timezone.now, auto_now=True, verbose_name='modified', db_index=True),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'aldryn_jobs_jobopeningsearchdocument_fts'
+DOCUMENT_TABLE = 'aldryn_jobs_jobopeningsearchdocument'
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE {fts} USING fts5("
+    "text, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+]
+POSTGRESQL_FTS = [
+    "CREATE INDEX {table}_text_fts ON {table} "
+    "USING gin (to_tsvector('simple', text))",
+]
+
+
+def create_full_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = SQLITE_FTS
+    elif vendor == 'postgresql':
+        statements = POSTGRESQL_FTS
+    else:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            for statement in statements:
+                cursor.execute(statement.format(
+                    fts=FTS_TABLE, table=DOCUMENT_TABLE))
+        except OperationalError:
+            # SQLite without FTS5, the search falls back to icontains
+            pass
+
+
+def drop_full_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute('DROP TABLE IF EXISTS {0}'.format(FTS_TABLE))
+        elif vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS {0}_text_fts'.format(
+                DOCUMENT_TABLE))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_jobs', '0006_jobopening_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobOpeningSearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=15, verbose_name='language')),
+                ('text', models.TextField(blank=True, verbose_name='text')),
+                ('job_opening', models.ForeignKey(related_name='search_documents', verbose_name='job opening', to='aldryn_jobs.JobOpening')),
+            ],
+            options={
+                'verbose_name': 'job opening search document',
+                'verbose_name_plural': 'job opening search documents',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='jobopeningsearchdocument',
+            unique_together=set([('job_opening', 'language')]),
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_jobs', '0007_jobopeningsearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedJobOpening',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_opening_id', models.IntegerField(verbose_name='job opening ID')),
+                ('deleted', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='deleted')),
+            ],
+            options={
+                'verbose_name': 'deleted job opening',
+                'verbose_name_plural': 'deleted job openings',
+            },
+        ),
+    ]
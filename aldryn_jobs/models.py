@@ -8,7 +8,12 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse, NoReverseMatch
 from django.db import models
-from django.db.models.signals import pre_delete
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch.dispatcher import receiver
 from django.utils.encoding import force_text, python_2_unicode_compatible
 from django.utils.timezone import now
@@ -28,9 +33,10 @@ from aldryn_translation_tools.models import (
     TranslationHelperMixin, TranslatedAutoSlugifyMixin,
 )
 
-from cms.models import CMSPlugin
+from cms.models import CMSPlugin, Placeholder
 from cms.models.fields import PlaceholderField
 from cms.utils.i18n import force_language
+from cms.utils.urlutils import admin_reverse
 from distutils.version import LooseVersion
 from functools import partial
 from os.path import join as join_path
@@ -40,8 +46,12 @@ from sortedm2m.fields import SortedManyToManyField
 from uuid import uuid4
 
 from .cms_appconfig import JobsConfig
-from .managers import JobOpeningsManager
-from .utils import get_valid_filename
+from .managers import (
+    JobApplicationManager,
+    JobOpeningsManager,
+    WatermarkManager,
+)
+from .utils import get_valid_filename, invalidate_cache, on_commit_once
 
 # NOTE: We need to use LooseVersion NOT StrictVersion as Aldryn sometimes uses
 # patched versions of Django with version numbers in the form: X.Y.Z.postN
@@ -140,9 +150,65 @@ JobApplicationFileField = partial(
 )
 
 
+class BatchedSlugMixin(object):
+    """
+    Makes TranslatedAutoSlugifyMixin look up all existing slugs sharing the
+    ideal slug's prefix with one query, and pick the next free suffix in
+    memory, instead of querying for each candidate slug in turn.
+    """
+    # Candidates with suffixes of up to this many digits share the prefix.
+    slug_suffix_digits = 6
+
+    def _filter_slug_queryset(self, qs):
+        """Narrows the queryset slugs have to be unique in."""
+        return qs
+
+    def _slug_exists(self, *args, **kwargs):
+        qs = kwargs.get('qs', None)
+        if qs is None:
+            qs = self._get_slug_queryset()
+        kwargs['qs'] = self._filter_slug_queryset(qs)
+        return super(BatchedSlugMixin, self)._slug_exists(*args, **kwargs)
+
+    def _get_free_slug(self, slug, is_taken):
+        """
+        Returns `slug`, or the first `slug-<idx>` candidate for which
+        `is_taken` returns False, like TranslatedAutoSlugifyMixin.make_new_slug.
+        """
+        idx = 1
+        candidate = slug
+        max_length = self.get_slug_max_length()
+        while is_taken(candidate):
+            if len(candidate) > max_length:
+                max_length = self.get_slug_max_length(len(str(idx)))
+            candidate = self._get_candidate_slug(slug[:max_length], idx)
+            idx += 1
+        return candidate
+
+    def make_new_slug(self, slug=None, qs=None):
+        if not slug:
+            slug = self._get_ideal_slug()
+        if qs is None:
+            qs = self._get_slug_queryset()
+        qs = self._filter_slug_queryset(qs)
+        prefix = slug[:self.get_slug_max_length(self.slug_suffix_digits)]
+        translations = self.translations.model.objects.filter(**{
+            'master__in': qs,
+            '{0}__startswith'.format(self.slug_field_name): prefix,
+        })
+        taken = set(translations.values_list(self.slug_field_name, flat=True))
+
+        def is_taken(candidate):
+            if candidate.startswith(prefix):
+                return candidate in taken
+            return self._slug_exists(candidate, qs=qs)
+        return self._get_free_slug(slug, is_taken)
+
+
 @version_controlled_content(follow=['supervisors', 'app_config'])
 @python_2_unicode_compatible
-class JobCategory(TranslatedAutoSlugifyMixin,
+class JobCategory(BatchedSlugMixin,
+                  TranslatedAutoSlugifyMixin,
                   TranslationHelperMixin,
                   TranslatableModel):
     slug_source_field_name = 'name'
@@ -177,14 +243,9 @@ class JobCategory(TranslatedAutoSlugifyMixin,
     def __str__(self):
         return self.safe_translation_getter('name', str(self.pk))
 
-    def _slug_exists(self, *args, **kwargs):
-        """Provide additional filtering for slug generation"""
-        qs = kwargs.get('qs', None)
-        if qs is None:
-            qs = self._get_slug_queryset()
+    def _filter_slug_queryset(self, qs):
         # limit qs to current app_config only
-        kwargs['qs'] = qs.filter(app_config=self.app_config)
-        return super(JobCategory, self)._slug_exists(*args, **kwargs)
+        return qs.filter(app_config=self.app_config)
 
     def get_absolute_url(self, language=None):
         language = language or self.get_current_language()
@@ -217,7 +278,8 @@ class JobCategory(TranslatedAutoSlugifyMixin,
 
 @version_controlled_content(follow=['category'])
 @python_2_unicode_compatible
-class JobOpening(TranslatedAutoSlugifyMixin,
+class JobOpening(BatchedSlugMixin,
+                 TranslatedAutoSlugifyMixin,
                  TranslationHelperMixin,
                  TranslatableModel):
     slug_source_field_name = 'title'
@@ -236,6 +298,10 @@ class JobOpening(TranslatedAutoSlugifyMixin,
     category = models.ForeignKey(JobCategory, verbose_name=_('category'),
         related_name='jobs')
     created = models.DateTimeField(auto_now_add=True)
+    # Also bumped when the translations or the content plugins of the
+    # opening change, see touch_job_opening() below.
+    modified = models.DateTimeField(_('modified'), auto_now=True,
+        db_index=True)
     is_active = models.BooleanField(_('active?'), default=True)
     publication_start = models.DateTimeField(_('published since'),
         null=True, blank=True)
@@ -246,6 +312,26 @@ class JobOpening(TranslatedAutoSlugifyMixin,
 
     ordering = models.IntegerField(_('ordering'), default=0)
 
+    # Denormalized application counters, kept in sync with the applications
+    # table by the signal handlers below and JobApplicationQuerySet.reject().
+    # Can be recomputed with the update_job_application_counters command.
+    applications_count = models.IntegerField(
+        _('applications'), default=0, db_index=True, editable=False)
+    pending_applications_count = models.IntegerField(
+        _('pending applications'), default=0, editable=False)
+    rejected_applications_count = models.IntegerField(
+        _('rejected applications'), default=0, editable=False)
+
+    # Key of the opening in an external system, used by the
+    # sync_job_openings command together with the hash of the last synced
+    # record to skip unchanged openings.
+    external_id = models.CharField(
+        _('external ID'), max_length=255, unique=True, null=True, blank=True,
+        help_text=_('Identifies the opening in an external system.'))
+    external_hash = models.CharField(
+        _('external hash'), max_length=40, blank=True, default='',
+        editable=False)
+
     objects = JobOpeningsManager()
 
     class Meta:
@@ -257,14 +343,9 @@ class JobOpening(TranslatedAutoSlugifyMixin,
     def __str__(self):
         return self.safe_translation_getter('title', str(self.pk))
 
-    def _slug_exists(self, *args, **kwargs):
-        """Provide additional filtering for slug generation"""
-        qs = kwargs.get('qs', None)
-        if qs is None:
-            qs = self._get_slug_queryset()
+    def _filter_slug_queryset(self, qs):
         # limit qs to current app_config only
-        kwargs['qs'] = qs.filter(category__app_config=self.category.app_config)
-        return super(JobOpening, self)._slug_exists(*args, **kwargs)
+        return qs.filter(category__app_config=self.category.app_config)
 
     def get_absolute_url(self, language=None):
         language = language or self.get_current_language()
@@ -303,6 +384,71 @@ class JobOpening(TranslatedAutoSlugifyMixin,
     def get_notification_emails(self):
         return self.category.get_notification_emails()
 
+    def save(self, *args, **kwargs):
+        # the translations saved along with the opening need not touch it
+        self._saving = True
+        try:
+            super(JobOpening, self).save(*args, **kwargs)
+        finally:
+            self._saving = False
+
+
+@python_2_unicode_compatible
+class JobOpeningSearchDocument(models.Model):
+    """
+    Plain text (title, lead-in and content) of a job opening in one language,
+    searched by the built-in full-text search, see aldryn_jobs.search.
+    """
+    job_opening = models.ForeignKey(JobOpening,
+        related_name='search_documents', verbose_name=_('job opening'))
+    language = models.CharField(_('language'), max_length=15)
+    text = models.TextField(_('text'), blank=True)
+
+    class Meta:
+        verbose_name = _('job opening search document')
+        verbose_name_plural = _('job opening search documents')
+        unique_together = [('job_opening', 'language')]
+
+    def __str__(self):
+        return '{0} ({1})'.format(self.job_opening_id, self.language)
+
+
+@python_2_unicode_compatible
+class DeletedJobOpening(models.Model):
+    """
+    Records a deleted job opening, so update_job_openings_index can remove
+    it from the search index. Pruned by the command.
+    """
+    job_opening_id = models.IntegerField(_('job opening ID'))
+    deleted = models.DateTimeField(_('deleted'), auto_now_add=True,
+                                   db_index=True)
+
+    class Meta:
+        verbose_name = _('deleted job opening')
+        verbose_name_plural = _('deleted job openings')
+
+    def __str__(self):
+        return force_text(self.job_opening_id)
+
+
+@python_2_unicode_compatible
+class Watermark(models.Model):
+    """
+    A named point in time kept in the database rather than the cache, such
+    as the time up to which update_job_openings_index last indexed.
+    """
+    name = models.CharField(_('name'), max_length=100, unique=True)
+    value = models.DateTimeField(_('value'))
+
+    objects = WatermarkManager()
+
+    class Meta:
+        verbose_name = _('watermark')
+        verbose_name_plural = _('watermarks')
+
+    def __str__(self):
+        return self.name
+
 
 @version_controlled_content(follow=['job_opening'])
 @python_2_unicode_compatible
@@ -328,14 +474,25 @@ class JobApplication(models.Model):
     rejection_date = models.DateTimeField(_('rejection date'),
         null=True, blank=True)
 
+    objects = JobApplicationManager()
+
     class Meta:
         ordering = ['-created']
         verbose_name = _('job application')
         verbose_name_plural = _('job applications')
 
+    def __init__(self, *args, **kwargs):
+        super(JobApplication, self).__init__(*args, **kwargs)
+        self._counted_state = self._get_counted_state()
+
     def __str__(self):
         return self.get_full_name()
 
+    def _get_counted_state(self):
+        # Read from __dict__ so deferred fields are not loaded here.
+        return (self.__dict__.get('job_opening_id'),
+                self.__dict__.get('is_rejected'))
+
     def get_full_name(self):
         full_name = ' '.join([self.first_name, self.last_name])
         return full_name.strip()
@@ -348,12 +505,214 @@ def cleanup_attachments(sender, instance, **kwargs):
             attachment.file.delete(False)
 
 
+def is_application(sender):
+    # On Django < 1.10 instances with deferred fields have a class of their
+    # own, which is sent as the sender of their signals.
+    return issubclass(sender, JobApplication)
+
+
+def _count_application(job_opening_id, is_rejected, delta):
+    if job_opening_id is None or is_rejected is None:
+        return
+    if is_rejected:
+        JobOpening.objects.update_application_counters(
+            job_opening_id, rejected=delta)
+    else:
+        JobOpening.objects.update_application_counters(
+            job_opening_id, pending=delta)
+
+
+@receiver(pre_save)
+def check_counted_application(sender, instance, raw, **kwargs):
+    if not is_application(sender):
+        return
+    # The counted state is unknown for raw saves (fixtures, reverted
+    # revisions), for deferred fields and for instances not loaded from the
+    # database. The counters of the openings the application belonged to and
+    # belongs to are then recomputed instead of adjusted.
+    unsaved = instance._state.adding and instance.pk is not None
+    if raw or unsaved or None in instance._counted_state:
+        instance._recount_opening_ids = set(
+            JobApplication.objects.filter(pk=instance.pk).values_list(
+                'job_opening_id', flat=True))
+    else:
+        instance._recount_opening_ids = None
+
+
+@receiver(post_save)
+def count_saved_application(sender, instance, created, **kwargs):
+    if not is_application(sender):
+        return
+    new_state = instance._get_counted_state()
+    recount_opening_ids = instance.__dict__.pop('_recount_opening_ids', None)
+    if recount_opening_ids is not None:
+        recount_opening_ids.add(instance.job_opening_id)
+        JobOpening.objects.refresh_application_counters(
+            pks=list(recount_opening_ids))
+    elif created:
+        _count_application(*new_state, delta=1)
+    elif new_state != instance._counted_state:
+        _count_application(*instance._counted_state, delta=-1)
+        _count_application(*new_state, delta=1)
+    instance._counted_state = new_state
+
+
+@receiver(pre_delete)
+def check_deleted_application(sender, instance, **kwargs):
+    if not is_application(sender):
+        return
+    if None in instance._counted_state:
+        # load the deferred fields while the row still exists
+        instance._counted_state = (instance.job_opening_id,
+                                   instance.is_rejected)
+
+
+@receiver(post_delete)
+def count_deleted_application(sender, instance, **kwargs):
+    if not is_application(sender):
+        return
+    _count_application(*instance._counted_state, delta=-1)
+
+
+@receiver(post_save, sender=JobOpening)
+def refresh_restored_application_counters(sender, instance, raw, **kwargs):
+    # Raw saves come from fixtures and from reverting revisions, both of which
+    # may carry stale counter values.
+    if raw:
+        JobOpening.objects.refresh_application_counters(pks=[instance.pk])
+
+
+def touch_job_openings(using=None, **lookup):
+    """
+    Updates the modification date of the job openings matching `lookup`
+    once the current transaction is committed, at most once per transaction.
+    """
+    def touch():
+        JobOpening.objects.using(using).filter(**lookup).update(
+            modified=now())
+    key = ('touch_job_openings',) + tuple(sorted(lookup.items()))
+    on_commit_once(touch, key, using)
+
+
+def touch_job_opening(sender, instance, using=None, **kwargs):
+    """
+    Updates the modification date of the job opening that `instance`, a
+    translation, belongs to, unless the translation is saved along with the
+    opening.
+    """
+    cache_name = instance._meta.get_field('master').get_cache_name()
+    if getattr(getattr(instance, cache_name, None), '_saving', False):
+        return
+    touch_job_openings(using, pk=instance.master_id)
+
+
+def refresh_search_document(sender, instance, raw=False, **kwargs):
+    """
+    Refreshes the search document of `instance`, a translation, so the
+    built-in search finds openings by their new title and lead-in right
+    away. Rendering the content is left to update_job_openings_index.
+    """
+    from .search import save_search_document
+    if raw:
+        return
+    if kwargs.get('signal') is post_delete:
+        JobOpeningSearchDocument.objects.filter(
+            job_opening_id=instance.master_id,
+            language=instance.language_code).delete()
+    else:
+        save_search_document(instance.master, instance.language_code,
+                             render=False)
+
+
+def touch_job_opening_of_plugin(sender, instance, **kwargs):
+    """
+    Updates the modification date of the job opening whose content contains
+    `instance`, a plugin. Plugins of other placeholders are left alone
+    without writing to the job openings table.
+    """
+    if not instance.placeholder_id:
+        return
+    try:
+        slot = instance.placeholder.slot
+    except Placeholder.DoesNotExist:
+        # deleted together with its placeholder
+        return
+    if slot != JobOpening._meta.get_field('content').slotname:
+        return
+    touch_job_openings(kwargs.get('using'), content=instance.placeholder_id)
+
+
+def connect_plugin_signals(models):
+    """
+    Connects touch_job_opening_of_plugin to the plugin models among
+    `models`, called with all models once the app registry is ready.
+    """
+    for model in models:
+        if issubclass(model, CMSPlugin):
+            post_save.connect(touch_job_opening_of_plugin, sender=model)
+            post_delete.connect(touch_job_opening_of_plugin, sender=model)
+
+
+@receiver(post_delete, sender=JobOpening)
+def record_deleted_job_opening(sender, instance, **kwargs):
+    DeletedJobOpening.objects.create(job_opening_id=instance.pk)
+
+
+# Watermark of the last change of jobs data that is not recorded in the
+# modification date of the job openings: changed app configs and
+# categories, and deleted openings.
+JOBS_CHANGED_WATERMARK = 'jobs_changed'
+
+
+def record_jobs_change(sender, using=None, **kwargs):
+    def record():
+        Watermark.objects.using(using).set_value(
+            JOBS_CHANGED_WATERMARK, now())
+    on_commit_once(record, JOBS_CHANGED_WATERMARK, using)
+
+
+post_save.connect(touch_job_opening,
+                  sender=JobOpening._parler_meta.root_model)
+post_delete.connect(touch_job_opening,
+                    sender=JobOpening._parler_meta.root_model)
+post_save.connect(refresh_search_document,
+                  sender=JobOpening._parler_meta.root_model)
+post_delete.connect(refresh_search_document,
+                    sender=JobOpening._parler_meta.root_model)
+
+
+def invalidate_jobs_cache(sender, using=None, **kwargs):
+    # once per transaction, however many objects and translations it saves
+    on_commit_once(invalidate_cache, 'invalidate_cache', using)
+
+
+for _sender in (JobsConfig,
+                JobCategory, JobCategory._parler_meta.root_model,
+                JobOpening, JobOpening._parler_meta.root_model):
+    post_save.connect(invalidate_jobs_cache, sender=_sender)
+    post_delete.connect(invalidate_jobs_cache, sender=_sender)
+
+for _sender in (JobsConfig,
+                JobCategory, JobCategory._parler_meta.root_model):
+    post_save.connect(record_jobs_change, sender=_sender)
+    post_delete.connect(record_jobs_change, sender=_sender)
+post_delete.connect(record_jobs_change, sender=JobOpening)
+
+
 @version_controlled_content(follow=['application'])
 class JobApplicationAttachment(models.Model):
     application = models.ForeignKey(JobApplication, related_name='attachments',
                                     verbose_name=_('job application'))
     file = JobApplicationFileField()
 
+    def get_download_url(self):
+        """
+        Returns the URL of the permission checked admin download view, which
+        should be used instead of the (possibly public) storage URL.
+        """
+        return admin_reverse('aldryn_jobs_jobapplication_attachment',
+                             args=(self.application_id, self.pk))
+
 
 @python_2_unicode_compatible
 class JobListPlugin(CMSPlugin):
@@ -413,9 +772,15 @@ class JobCategoriesPlugin(CMSPlugin):
 
     @property
     def categories(self):
-        categories_qs = JobCategory.objects.namespace(
-            self.app_config.namespace).order_by('ordering')
-        return (category for category in categories_qs if category.count())
+        namespace = self.app_config.namespace
+        # count the openings of all categories with one grouped query
+        counts = JobOpening.objects.active().namespace(
+            namespace).facet_counts('category')
+        categories = JobCategory.objects.namespace(namespace).filter(
+            pk__in=list(counts)).order_by('ordering')
+        for category in categories:
+            category.opening_count = counts[category.pk]
+            yield category
 
     def copy_relations(self, oldinstance):
         self.app_config = oldinstance.app_config
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import transaction
+
+# Distance between the ordering values of neighbouring rows after a
+# rebalance. Moving a row between two neighbours takes the middle value, so
+# about log2(ORDERING_GAP) moves into the same spot fit before the values
+# have to be spread out again.
+ORDERING_GAP = getattr(settings, 'ALDRYN_JOBS_ORDERING_GAP', 1024)
+
+
+def get_ordering_between(lower, upper, gap=None):
+    """
+    Returns an ordering value strictly between `lower` and `upper`, either
+    of which may be None for an open end, or None if there is no room left.
+    """
+    gap = gap or ORDERING_GAP
+    if lower is None and upper is None:
+        return 0
+    if lower is None:
+        return upper - gap
+    if upper is None:
+        return lower + gap
+    if upper - lower < 2:
+        return None
+    return lower + (upper - lower) // 2
+
+
+def needs_rebalancing(queryset, field_name='ordering', min_gap=2):
+    """
+    Tells whether two rows of `queryset` share an ordering value or are
+    closer than `min_gap` to each other.
+    """
+    values = queryset.order_by(field_name).values_list(field_name, flat=True)
+    previous = None
+    for value in values.iterator():
+        if previous is not None and value - previous < min_gap:
+            return True
+        previous = value
+    return False
+
+
+def rebalance_ordering(queryset, field_name='ordering', gap=None):
+    """
+    Spreads the ordering values of `queryset` `gap` apart, keeping their
+    current order (ties are broken by primary key). Only rows whose value
+    changes are written. Returns a list of (pk, ordering) pairs of the rows
+    that were updated.
+    """
+    gap = gap or ORDERING_GAP
+    manager = queryset.model._default_manager
+    rows = queryset.order_by(field_name, 'pk').values_list('pk', field_name)
+    updated = []
+    with transaction.atomic():
+        for idx, (pk, value) in enumerate(list(rows), 1):
+            if value != idx * gap:
+                manager.filter(pk=pk).update(**{field_name: idx * gap})
+                updated.append((pk, idx * gap))
+    return updated
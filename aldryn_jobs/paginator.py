@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.encoding import force_bytes
+from django.utils.functional import cached_property
+
+ESTIMATED_COUNT_THRESHOLD = getattr(
+    settings, 'ALDRYN_JOBS_ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+ESTIMATED_COUNT_CACHE_TIMEOUT = getattr(
+    settings, 'ALDRYN_JOBS_ADMIN_ESTIMATED_COUNT_CACHE_TIMEOUT', 300)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that avoids exact COUNT(*) queries on huge tables.
+
+    On PostgreSQL the number of rows is taken from the query planner's
+    estimate. On other databases the exact count is cached for
+    `cache_timeout` seconds. Either way, exact (uncached) counts are used as
+    long as the result is smaller than `threshold`, and `is_estimated` tells
+    whether `count` is approximate.
+    """
+    threshold = ESTIMATED_COUNT_THRESHOLD
+    cache_timeout = ESTIMATED_COUNT_CACHE_TIMEOUT
+    is_estimated = False
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            # Not a queryset, counting is cheap.
+            return len(self.object_list)
+
+        estimate = self.get_planner_estimate()
+        if estimate is not None:
+            if estimate < self.threshold:
+                return self.object_list.count()
+            self.is_estimated = True
+            return estimate
+
+        cache_key = self.get_cache_key()
+        count = cache.get(cache_key)
+        if count is not None:
+            self.is_estimated = True
+            return count
+        count = self.object_list.count()
+        if count >= self.threshold:
+            cache.set(cache_key, count, self.cache_timeout)
+        return count
+
+    def get_planner_estimate(self):
+        """
+        Returns the planner's row estimate for the queryset on PostgreSQL,
+        otherwise None.
+        """
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor = connection.cursor()
+        try:
+            cursor.execute('EXPLAIN (FORMAT JSON) {0}'.format(sql), params)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        if not isinstance(plan, list):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_cache_key(self):
+        sql, params = self.object_list.order_by().query.sql_with_params()
+        digest = hashlib.md5(force_bytes('{0}{1!r}'.format(sql, params)))
+        return 'aldryn_jobs:count:{0}'.format(digest.hexdigest())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Built-in full-text search for job openings, which needs no search service.
+
+The plain text of every job opening is stored per language in
+JobOpeningSearchDocument. Where the database supports it, the documents are
+searched with its full-text engine: PostgreSQL's text search (with a GIN
+index), or an SQLite FTS5 table kept in sync by triggers. Both are set up by
+the migrations. On other databases every word is looked up with icontains.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpRequest
+from django.template import RequestContext
+from django.utils import translation
+from django.utils.encoding import force_bytes
+
+try:
+    # keeps words apart where tags separate them
+    from aldryn_search.utils import strip_tags
+except ImportError:
+    from django.utils.html import strip_tags
+
+try:
+    # django CMS 3.4+ renders plugins through a content renderer
+    from cms.plugin_rendering import ContentRenderer
+except ImportError:
+    ContentRenderer = None
+
+from .models import JobOpening, JobOpeningSearchDocument
+
+SEARCH_TEXT_CACHE_TIMEOUT = getattr(
+    settings, 'ALDRYN_JOBS_SEARCH_TEXT_CACHE_TIMEOUT', 60 * 60 * 24 * 30)
+
+# Name of the SQLite FTS5 table indexing JobOpeningSearchDocument.text.
+FTS_TABLE = 'aldryn_jobs_jobopeningsearchdocument_fts'
+
+# {database alias: whether the FTS5 table exists}
+_fts_tables = {}
+
+
+def get_request(language):
+    """Returns a request to render plugins with outside of a request."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = '/'
+    request.META['SERVER_NAME'] = Site.objects.get_current().domain
+    request.META['SERVER_PORT'] = '80'
+    request.user = AnonymousUser()
+    request.session = {}
+    request.LANGUAGE_CODE = language
+    request.current_page = None
+    return request
+
+
+def get_placeholder_text(placeholder, language, request=None):
+    """
+    Returns the plain text of the plugins in `placeholder` in `language`.
+    The text is cached under a key made of the plugins' ids and change dates,
+    so the plugins are only rendered again after one of them was added,
+    changed or removed. Without a `request` nothing is rendered and None is
+    returned if the text is not cached.
+    """
+    plugins = list(placeholder.cmsplugin_set.filter(language=language))
+    if not plugins:
+        return ''
+    fingerprint = hashlib.sha1(force_bytes(' '.join(
+        '{0}:{1}'.format(plugin.pk, plugin.changed_date.isoformat())
+        for plugin in plugins))).hexdigest()
+    cache_key = 'aldryn_jobs:search_text:{0}:{1}:{2}'.format(
+        placeholder.pk, language, fingerprint)
+    text = cache.get(cache_key)
+    if text is None and request is not None:
+        text_bits = []
+        context = RequestContext(request)
+        renderer = ContentRenderer(request) if ContentRenderer else None
+        for base_plugin in plugins:
+            instance, plugin_type = base_plugin.get_plugin_instance()
+            if instance is None:
+                continue
+            if renderer is not None:
+                plugin_content = renderer.render_plugin(instance, context)
+            else:
+                plugin_content = instance.render_plugin(context=context)
+            text_bits.append(strip_tags(plugin_content))
+        text = ' '.join(' '.join(text_bits).split())
+        cache.set(cache_key, text, SEARCH_TEXT_CACHE_TIMEOUT)
+    return text
+
+
+def save_search_document(opening, language, render=True):
+    """
+    Saves the search document of `opening` in `language`. With `render`
+    false the content plugins are not rendered, their text is only included
+    if it is cached.
+    """
+    current_language = opening.get_current_language()
+    opening.set_current_language(language)
+    try:
+        with translation.override(language):
+            text_bits = [opening.title, strip_tags(opening.lead_in or '')]
+            if opening.content_id:
+                text_bits.append(get_placeholder_text(
+                    opening.content, language,
+                    get_request(language) if render else None))
+    finally:
+        opening.set_current_language(current_language)
+    JobOpeningSearchDocument.objects.update_or_create(
+        job_opening=opening, language=language,
+        defaults={'text': ' '.join(bit for bit in text_bits if bit)})
+
+
+def update_search_documents(openings):
+    """
+    Rebuilds the search documents of `openings`, a JobOpening queryset, from
+    the title, lead-in and content of each of their translations. Returns
+    the number of openings updated.
+    """
+    count = 0
+    for opening in openings.prefetch_related('translations'):
+        languages = opening.get_available_languages()
+        for language in languages:
+            save_search_document(opening, language)
+        opening.search_documents.exclude(language__in=languages).delete()
+        count += 1
+    return count
+
+
+def has_fts_table(connection):
+    if connection.alias not in _fts_tables:
+        _fts_tables[connection.alias] = (
+            FTS_TABLE in connection.introspection.table_names())
+    return _fts_tables[connection.alias]
+
+
+def search_documents(query, language=None):
+    """
+    Returns the search documents in `language` (in any language if not
+    given) that contain all words of `query` (as prefixes where full-text
+    search is available).
+    """
+    words = re.findall(r'\w+', query, re.UNICODE)
+    documents = JobOpeningSearchDocument.objects.all()
+    if language is not None:
+        documents = documents.filter(language=language)
+    if not words:
+        return documents.none()
+    connection = connections[documents.db]
+    if connection.vendor == 'postgresql':
+        return documents.extra(
+            where=["to_tsvector('simple', text) @@ to_tsquery('simple', %s)"],
+            params=[' & '.join("'{0}':*".format(word) for word in words)])
+    if connection.vendor == 'sqlite' and has_fts_table(connection):
+        return documents.extra(
+            # unqualified, as the table is aliased within subqueries
+            where=['id IN (SELECT rowid FROM {0} WHERE {0} MATCH %s)'.format(
+                FTS_TABLE)],
+            params=[' '.join('"{0}"*'.format(word) for word in words)])
+    for word in words:
+        documents = documents.filter(text__icontains=word)
+    return documents
+
+
+def search_job_openings(query, language, queryset=None):
+    """
+    Narrows `queryset` (by default all job openings) to the openings
+    matching `query` in `language`.
+    """
+    if queryset is None:
+        queryset = JobOpening.objects.all()
+    return queryset.filter(pk__in=search_documents(
+        query, language).values('job_opening'))
@@ -3,11 +3,11 @@
 from __future__ import unicode_literals
 
 from django.conf import settings
-from django.template import RequestContext
 
 from aldryn_search.utils import get_index_base, strip_tags
 
 from .models import JobOpening
+from .search import get_placeholder_text
 
 
 class JobOpeningsIndex(get_index_base()):
@@ -32,12 +32,10 @@ class JobOpeningsIndex(get_index_base()):
 
     def get_search_data(self, obj, language, request):
         text_bits = [strip_tags(obj.lead_in)]
-        plugins = obj.content.cmsplugin_set.filter(language=language)
-        for base_plugin in plugins:
-            instance, plugin_type = base_plugin.get_plugin_instance()
-            if instance is not None:
-                plugin_content = strip_tags(instance.render_plugin(
-                    context=RequestContext(request)))
-                text_bits.append(plugin_content)
-
+        plugin_text = self.get_plugin_text(obj.content, language, request)
+        if plugin_text:
+            text_bits.append(plugin_text)
         return ' '.join(text_bits)
+
+    def get_plugin_text(self, placeholder, language, request):
+        return get_placeholder_text(placeholder, language, request)
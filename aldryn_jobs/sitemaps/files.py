@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-generated sitemap files.
+
+write_sitemaps() renders the jobs sitemaps into gzip-compressed files in a
+new directory (a generation) of the storage, writing the sitemap index
+last. A generation is only used once its index exists, so readers never
+see a partially written set of files. aldryn_jobs.sitemaps.views serves
+the files of the newest generation.
+"""
+from __future__ import unicode_literals
+
+import gzip
+import os
+import posixpath
+import re
+from collections import OrderedDict
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import loader
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+
+from .sitemap import JobOpeningCategoriesSitemap, JobOpeningSitemap
+
+SITEMAP_STORAGE = getattr(settings, 'ALDRYN_JOBS_SITEMAP_STORAGE', None)
+SITEMAP_DIRECTORY = getattr(
+    settings, 'ALDRYN_JOBS_SITEMAP_DIRECTORY', 'aldryn_jobs/sitemaps')
+
+SITEMAPS = OrderedDict([
+    ('jobs', JobOpeningSitemap),
+    ('job-categories', JobOpeningCategoriesSitemap),
+])
+
+INDEX_FILENAME = 'sitemap.xml'
+
+# Generations are named after the time they were written at.
+GENERATION_FORMAT = '%Y%m%d%H%M%S%f'
+GENERATION_RE = re.compile(r'^\d{20}$')
+
+
+def get_storage():
+    return SITEMAP_STORAGE or default_storage
+
+
+def gzip_content(text):
+    """Returns `text` gzip-compressed, as a file to save to a storage."""
+    buffer = BytesIO()
+    gzip_file = gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0)
+    try:
+        gzip_file.write(force_bytes(text))
+    finally:
+        gzip_file.close()
+    return ContentFile(buffer.getvalue())
+
+
+def gunzip_content(content):
+    return gzip.GzipFile(fileobj=BytesIO(content), mode='rb').read()
+
+
+def get_generations(storage):
+    """
+    Returns the directories of all generations, the newest first. Other
+    directories in SITEMAP_DIRECTORY are left alone.
+    """
+    try:
+        directories, files = storage.listdir(SITEMAP_DIRECTORY)
+    except (OSError, NotImplementedError):
+        return []
+    return [posixpath.join(SITEMAP_DIRECTORY, directory)
+            for directory in sorted(directories, reverse=True)
+            if GENERATION_RE.match(directory)]
+
+
+def get_generation(storage=None):
+    """
+    Returns the directory of the newest complete generation, or None if the
+    sitemaps were not generated yet. Looked up on every call (usually a
+    single listdir), so all processes serve a new generation as soon as it
+    is complete.
+    """
+    storage = storage or get_storage()
+    for directory in get_generations(storage):
+        if storage.exists(posixpath.join(directory, INDEX_FILENAME + '.gz')):
+            return directory
+    return None
+
+
+def delete_generation(storage, directory):
+    directories, files = storage.listdir(directory)
+    for filename in files:
+        storage.delete(posixpath.join(directory, filename))
+    try:
+        # storages have no API to remove directories
+        os.rmdir(storage.path(directory))
+    except (NotImplementedError, OSError):
+        pass
+
+
+def write_sitemaps(site, base_path, protocol='http', storage=None):
+    """
+    Writes the sitemaps of SITEMAPS and their index into a new generation
+    and deletes the generations before the previous one, which may still be
+    read by running requests. The index lists the files under `base_path`,
+    the path the sitemap files are served at. Returns the number of files
+    written.
+    """
+    storage = storage or get_storage()
+    generation = posixpath.join(
+        SITEMAP_DIRECTORY, timezone.now().strftime(GENERATION_FORMAT))
+    base_url = '{0}://{1}{2}'.format(protocol, site.domain, base_path)
+
+    filenames = []
+    for section, sitemap_class in SITEMAPS.items():
+        sitemap = sitemap_class()
+        for page in sitemap.paginator.page_range:
+            filename = 'sitemap-{0}-{1}.xml'.format(section, page)
+            content = loader.render_to_string('aldryn_jobs/sitemap.xml', {
+                'urlset': sitemap.get_urls(
+                    page=page, site=site, protocol=protocol),
+            })
+            storage.save(posixpath.join(generation, filename + '.gz'),
+                         gzip_content(content))
+            filenames.append(filename)
+
+    # the index is written last, it marks the generation as complete
+    content = loader.render_to_string('aldryn_jobs/sitemap_index.xml', {
+        'sitemaps': [base_url + filename for filename in filenames],
+    })
+    storage.save(posixpath.join(generation, INDEX_FILENAME + '.gz'),
+                 gzip_content(content))
+
+    for directory in get_generations(storage)[2:]:
+        delete_generation(storage, directory)
+    return len(filenames) + 1
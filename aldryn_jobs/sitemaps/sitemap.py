@@ -1,23 +1,216 @@
 # -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import namedtuple
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.translation import override
 
 from ..models import JobCategory, JobOpening
+from ..utils import get_cache_key, namespace_is_apphooked
 
+SITEMAP_CACHE_TIMEOUT = getattr(
+    settings, 'ALDRYN_JOBS_SITEMAP_CACHE_TIMEOUT', 60 * 60)
 
-class JobOpeningCategoriesSitemap(Sitemap):
-    changefreq = "monthly"
-    priority = 0.5
+# An entry of the sitemaps: the URL of one translation, its last
+# modification and the (language, URL) pairs of all translations, which are
+# listed as hreflang alternates.
+SitemapItem = namedtuple('SitemapItem', 'location lastmod alternates')
 
-    def items(self):
-        return JobCategory.objects.all()
+
+class CachedItems(object):
+    """
+    The cached entries of `sitemap`, a sequence for its paginator which only
+    reads the chunks of the sliced entries from the cache.
+    """
+
+    def __init__(self, sitemap, cache_key, count):
+        self.sitemap = sitemap
+        self.cache_key = cache_key
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, step = index.indices(self._count)
+        if start >= stop:
+            return []
+        size = self.sitemap.cache_chunk_size
+        first, last = start // size, (stop - 1) // size
+        chunks = self.sitemap.get_cached_chunks(
+            self.cache_key, range(first, last + 1))
+        items = []
+        for number in range(first, last + 1):
+            items.extend(chunks[number])
+        offset = first * size
+        return items[start - offset:stop - offset:step]
 
 
-class JobOpeningSitemap(Sitemap):
-    changefreq = "monthly"
+class JobsSitemapMixin(object):
+    """
+    Lists one entry per translation of the objects, with the other
+    translations as hreflang alternates. The entries are built in bulk and
+    cached until jobs data changes, see aldryn_jobs.utils.invalidate_cache.
+    Subclasses override get_objects() to list their objects, and
+    get_lastmod() and get_namespace() for objects without a `modified` date
+    or an `app_config`.
+    """
+    changefreq = 'monthly'
     priority = 0.5
+    # the maximum number of URLs of a sitemap file
+    limit = 50000
+    # the number of entries cached per key, keeping each cached value well
+    # below the 1 MB limit of memcached
+    cache_chunk_size = 1000
+
+    def get_objects(self):
+        """Returns the objects to list, none by default like Sitemap.items."""
+        return []
+
+    def get_lastmod(self, obj):
+        return getattr(obj, 'modified', None)
+
+    def get_namespace(self, obj):
+        """Returns the namespace of the apphook `obj` is shown by."""
+        return getattr(getattr(obj, 'app_config', None), 'namespace', None)
+
+    def get_languages(self, obj):
+        """Returns the languages `obj` can be shown in."""
+        return obj.get_available_languages()
+
+    def get_cache_timeout(self):
+        return JobOpening.objects.all().publication_cache_timeout(
+            SITEMAP_CACHE_TIMEOUT)
+
+    def get_translation_urls(self, obj, languages):
+        """
+        Returns (language, URL) pairs for the translations of `obj` in
+        `languages` whose apphook resolves.
+        """
+        urls = []
+        for language in languages:
+            with override(language):
+                if not namespace_is_apphooked(self.get_namespace(obj)):
+                    continue
+                urls.append((language, obj.get_absolute_url(language)))
+        return urls
+
+    def build_items(self):
+        site_languages = [code for code, name in settings.LANGUAGES]
+        items = []
+        for obj in self.get_objects():
+            available = self.get_languages(obj)
+            languages = [language for language in site_languages
+                         if language in available]
+            alternates = self.get_translation_urls(obj, languages)
+            lastmod = self.get_lastmod(obj)
+            items.extend(SitemapItem(location, lastmod, alternates)
+                         for language, location in alternates)
+        return items
+
+    def cache_items(self, cache_key):
+        """
+        Builds the entries and caches them in chunks of cache_chunk_size,
+        with their number under `cache_key`.
+        """
+        items = self.build_items()
+        size = self.cache_chunk_size
+        timeout = self.get_cache_timeout()
+        cache.set_many(dict(
+            ('{0}:{1}'.format(cache_key, number), items[start:start + size])
+            for number, start in enumerate(range(0, len(items), size))),
+            timeout)
+        cache.set(cache_key, len(items), timeout)
+        return items
+
+    def get_cached_chunks(self, cache_key, numbers):
+        """
+        Returns {number: entries} for the chunks `numbers`, building the
+        entries again if one of them is no longer cached.
+        """
+        keys = dict((number, '{0}:{1}'.format(cache_key, number))
+                    for number in numbers)
+        cached = cache.get_many(list(keys.values()))
+        if len(cached) == len(keys):
+            return dict((number, cached[key]) for number, key in keys.items())
+        items = self.cache_items(cache_key)
+        size = self.cache_chunk_size
+        return dict((number, items[number * size:(number + 1) * size])
+                    for number in numbers)
 
     def items(self):
-        return JobOpening.objects.active()
+        cache_key = get_cache_key('sitemap', self.__class__.__name__)
+        count = cache.get(cache_key)
+        if count is None:
+            count = len(self.cache_items(cache_key))
+        return CachedItems(self, cache_key, count)
+
+    def location(self, item):
+        return item.location
+
+    def lastmod(self, item):
+        return item.lastmod
+
+    def get_urls(self, *args, **kwargs):
+        urls = super(JobsSitemapMixin, self).get_urls(*args, **kwargs)
+        for url in urls:
+            # prefix the alternates with the protocol and domain of location
+            item = url['item']
+            base = url['location'][:-len(item.location)]
+            url['alternates'] = [(language, base + location)
+                                 for language, location in item.alternates]
+        return urls
+
+
+class JobOpeningCategoriesSitemap(JobsSitemapMixin, Sitemap):
+    """Lists the translations of the categories with active openings."""
+
+    def get_objects(self):
+        # the last modification of the active openings of each category
+        self.modified = dict(
+            JobOpening.objects.active()
+                              .order_by()
+                              .values_list('category')
+                              .annotate(modified=Max('modified'))
+        )
+        return (
+            JobCategory.objects
+                       .filter(pk__in=list(self.modified))
+                       .select_related('app_config')
+                       .prefetch_related('translations')
+        )
+
+    def get_lastmod(self, category):
+        return self.modified[category.pk]
+
+
+class JobOpeningSitemap(JobsSitemapMixin, Sitemap):
+    """Lists the translations of the active job openings."""
+
+    def get_objects(self):
+        return (
+            JobOpening.objects
+                      .active()
+                      .select_related('category__app_config')
+                      .prefetch_related('translations',
+                                        'category__translations')
+        )
+
+    def get_lastmod(self, opening):
+        # an opening scheduled for publication changed when it got published
+        return max(lastmod for lastmod in [
+            opening.modified, opening.publication_start] if lastmod)
+
+    def get_namespace(self, opening):
+        return super(JobOpeningSitemap, self).get_namespace(opening.category)
 
-    def lastmod(self, obj):
-        return obj.publication_start
+    def get_languages(self, opening):
+        # the URL of an opening contains the slug of its category
+        return set(opening.get_available_languages()).intersection(
+            opening.category.get_available_languages())
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.conf.urls import url
+
+from .views import sitemap_file
+
+urlpatterns = [
+    url(r'^(?P<filename>sitemap[-\w]*\.xml)$', sitemap_file,
+        name='aldryn-jobs-sitemap'),
+]
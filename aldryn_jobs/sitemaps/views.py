@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import posixpath
+
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .files import get_generation, get_storage, gunzip_content
+
+
+def sitemap_file(request, filename):
+    """
+    Serves a sitemap file written by the generate_job_sitemaps command,
+    gzip-encoded if the client accepts it.
+    """
+    storage = get_storage()
+    generation = get_generation(storage)
+    if generation is None:
+        raise Http404
+    path = posixpath.join(generation, filename + '.gz')
+    if not storage.exists(path):
+        raise Http404
+    with storage.open(path, 'rb') as sitemap:
+        content = sitemap.read()
+
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(content, content_type='application/xml')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(
+            gunzip_content(content), content_type='application/xml')
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
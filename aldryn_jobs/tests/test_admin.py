@@ -0,0 +1,397 @@
+import csv
+import json
+import zipfile
+
+from django.contrib.auth.models import Permission
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import BytesIO, StringIO
+
+from ..models import JobApplication, JobOpening
+from ..paginator import EstimatedCountPaginator
+
+from .base import JobsBaseTestCase
+
+
+class ApplicationCountersTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(ApplicationCountersTestCase, self).setUp()
+        self.opening = self.create_default_job_opening()
+
+    def create_application(self, job_opening=None, **kwargs):
+        values = dict(self.application_default_values, **kwargs)
+        return JobApplication.objects.create(
+            job_opening=job_opening or self.opening, **values)
+
+    def assertCounters(self, opening, total, pending, rejected):
+        opening = JobOpening.objects.get(pk=opening.pk)
+        self.assertEqual(
+            (opening.applications_count,
+             opening.pending_applications_count,
+             opening.rejected_applications_count),
+            (total, pending, rejected))
+
+    def test_counters_follow_created_and_deleted_applications(self):
+        application = self.create_application()
+        self.create_application(is_rejected=True)
+        self.assertCounters(self.opening, 2, 1, 1)
+        application.delete()
+        self.assertCounters(self.opening, 1, 0, 1)
+
+    def test_counters_follow_changed_applications(self):
+        other_opening = self.create_default_job_opening()
+        application = self.create_application()
+        application.is_rejected = True
+        application.save()
+        self.assertCounters(self.opening, 1, 0, 1)
+        application.job_opening = other_opening
+        application.save()
+        self.assertCounters(self.opening, 0, 0, 0)
+        self.assertCounters(other_opening, 1, 0, 1)
+
+    def test_counters_follow_applications_with_deferred_fields(self):
+        application = self.create_application()
+        application = JobApplication.objects.only('first_name').get(
+            pk=application.pk)
+        application.is_rejected = True
+        application.save()
+        self.assertCounters(self.opening, 1, 0, 1)
+
+        JobApplication.objects.only('first_name').get(
+            pk=application.pk).delete()
+        self.assertCounters(self.opening, 0, 0, 0)
+
+    def test_counters_follow_raw_saves(self):
+        # as loaddata and reverting a revision do
+        other_opening = self.create_default_job_opening()
+        application = self.create_application()
+        restored = JobApplication.objects.get(pk=application.pk)
+        restored.job_opening = other_opening
+        restored.is_rejected = True
+        restored._counted_state = restored._get_counted_state()
+        restored.save_base(raw=True)
+        self.assertCounters(self.opening, 0, 0, 0)
+        self.assertCounters(other_opening, 1, 0, 1)
+
+    def test_queryset_reject_updates_counters(self):
+        self.create_application()
+        self.create_application()
+        self.create_application(is_rejected=True)
+        JobApplication.objects.filter(job_opening=self.opening).reject()
+        self.assertCounters(self.opening, 3, 0, 3)
+        self.assertFalse(
+            JobApplication.objects.filter(rejection_date=None).exists())
+
+    def test_command_repairs_counters(self):
+        self.create_application()
+        self.create_application(is_rejected=True)
+        JobOpening.objects.filter(pk=self.opening.pk).update(
+            applications_count=10, pending_applications_count=7)
+        out = StringIO()
+        call_command('update_job_application_counters', stdout=out)
+        self.assertCounters(self.opening, 2, 1, 1)
+        self.assertIn('1 job opening', out.getvalue())
+
+
+class JobApplicationAdminTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(JobApplicationAdminTestCase, self).setUp()
+        self.opening = self.create_default_job_opening(translated=True)
+        self.other_opening = self.create_new_job_opening(self.prepare_data())
+        for job_opening in (self.opening, self.other_opening):
+            JobApplication.objects.create(
+                job_opening=job_opening,
+                **self.make_new_values(self.application_values_raw,
+                                       job_opening.pk))
+        self.admin_user = self.create_user(
+            'admin', 'admin_pw', is_staff=True, is_superuser=True)
+        self.client.login(username='admin', password='admin_pw')
+
+    def test_changelist_filters_by_job_opening(self):
+        url = reverse('admin:aldryn_jobs_jobapplication_changelist')
+        response = self.client.get(url, {'job_opening': self.opening.pk})
+        self.assertContains(response, 'First_name_{0}'.format(
+            self.opening.pk))
+        self.assertNotContains(response, 'First_name_{0}'.format(
+            self.other_opening.pk))
+
+    def test_job_opening_autocomplete(self):
+        url = reverse(
+            'admin:aldryn_jobs_jobapplication_job_opening_autocomplete')
+        response = self.client.get(url, {'q': 'revision 1'})
+        results = json.loads(response.content.decode('utf-8'))['results']
+        self.assertEqual([result['id'] for result in results],
+                         [str(self.other_opening.pk)])
+
+    def test_job_opening_autocomplete_needs_application_permission(self):
+        user = self.create_staff_user('applications', 'applications')
+        user.user_permissions.add(Permission.objects.get(
+            content_type__app_label='aldryn_jobs',
+            codename='change_jobapplication'))
+        self.client.login(username='applications', password='applications')
+        url = reverse(
+            'admin:aldryn_jobs_jobapplication_job_opening_autocomplete')
+        response = self.client.get(url, {'q': 'revision 1'})
+        self.assertEqual(response.status_code, 200)
+        user.user_permissions.clear()
+        response = self.client.get(url, {'q': 'revision 1'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_changelist_does_not_fetch_attachments(self):
+        self.opening.applications.get().attachments.create()
+        url = reverse('admin:aldryn_jobs_jobapplication_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'jobapplicationattachment' in query['sql']])
+
+    def test_change_form_lists_attachments(self):
+        application = self.opening.applications.get()
+        attachment = application.attachments.create(
+            file='attachments/cv.pdf')
+        url = reverse('admin:aldryn_jobs_jobapplication_change',
+                      args=[application.pk])
+        response = self.client.get(url)
+        self.assertContains(
+            response, '<a href="{0}">cv.pdf</a>'.format(
+                attachment.get_download_url()), html=True)
+
+    def test_change_form_shows_recent_applications(self):
+        for idx in range(1, 12):
+            JobApplication.objects.create(
+                job_opening=self.opening, first_name='First',
+                last_name='Last', email='applicant_{0}@example.com'.format(idx))
+        url = reverse('admin:aldryn_jobs_jobopening_change',
+                      args=[self.opening.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'applicant_11@example.com')
+        self.assertContains(response, 'applicant_2@example.com')
+        self.assertNotContains(response, 'applicant_1@example.com')
+        applications_url = reverse('admin:aldryn_jobs_jobopening_applications',
+                                   args=[self.opening.pk])
+        self.assertContains(response, applications_url)
+
+        response = self.client.get(applications_url)
+        self.assertContains(response, 'applicant_1@example.com')
+        self.assertContains(response, 'example_{0}@example.com'.format(
+            self.opening.pk))
+        self.assertNotContains(response, 'data-page')
+
+    def create_attachment(self, content=b'0123456789'):
+        application = self.opening.applications.get()
+        attachment = application.attachments.create()
+        attachment.file.save('cv.pdf', ContentFile(content))
+        return attachment
+
+    def test_attachment_download(self):
+        attachment = self.create_attachment()
+        response = self.client.get(attachment.get_download_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_attachment_download_range(self):
+        attachment = self.create_attachment()
+        url = attachment.get_download_url()
+        response = self.client.get(url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        response = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get(url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_attachment_download_offload(self):
+        attachment = self.create_attachment()
+        url = attachment.get_download_url()
+        with self.settings(ALDRYN_JOBS_ATTACHMENT_SENDFILE='X-Accel-Redirect'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected/' + attachment.file.name)
+        self.assertEqual(response.content, b'')
+
+    def test_attachment_download_requires_permission(self):
+        attachment = self.create_attachment()
+        self.client.logout()
+        self.client.login(username=self.staff_user.username,
+                          password=self.staff_user_password)
+        response = self.client.get(attachment.get_download_url())
+        self.assertEqual(response.status_code, 403)
+
+    def export(self, action):
+        url = reverse('admin:aldryn_jobs_jobapplication_changelist')
+        response = self.client.post(url, {
+            'action': action,
+            '_selected_action': [self.opening.applications.get().pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_export_as_csv(self):
+        content = self.export('export_as_csv').decode('utf-8-sig')
+        rows = content.splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn('First_name_{0}'.format(self.opening.pk), rows[1])
+        self.assertIn(self.opening.title, rows[1])
+        self.assertIn(self.default_category.name, rows[1])
+
+    def test_export_as_xlsx(self):
+        content = self.export('export_as_xlsx')
+        workbook = zipfile.ZipFile(BytesIO(content))
+        self.assertIsNone(workbook.testzip())
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('First_name_{0}'.format(self.opening.pk), sheet)
+
+    def test_exports_escape_formulas(self):
+        formula = '=HYPERLINK("http://example.com/","Click")'
+        self.opening.applications.update(
+            first_name=formula, last_name='-1+2', email='@SUM(1)')
+        content = self.export('export_as_csv').decode('utf-8-sig')
+        row = next(csv.reader(StringIO(content.splitlines()[1])))
+        self.assertEqual(row[3:6], ["'" + formula, "'-1+2", "'@SUM(1)"])
+        sheet = zipfile.ZipFile(BytesIO(self.export('export_as_xlsx'))).read(
+            'xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('>&#39;=HYPERLINK(', sheet)
+
+    def test_download_attachments(self):
+        application = self.opening.applications.get()
+        for content in (b'first', b'second'):
+            attachment = application.attachments.create()
+            attachment.file.save('cv.pdf', ContentFile(content))
+        content = self.export('download_attachments')
+        archive = zipfile.ZipFile(BytesIO(content))
+        self.assertIsNone(archive.testzip())
+        folder = '{0}-{1}-{2}'.format(
+            application.pk, application.last_name,
+            application.first_name).lower()
+        self.assertEqual(
+            sorted(archive.namelist()),
+            [folder + '/cv-1.pdf', folder + '/cv.pdf'])
+        self.assertEqual(archive.read(folder + '/cv.pdf'), b'first')
+
+
+class JobCategoryAdminTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(JobCategoryAdminTestCase, self).setUp()
+        self.default_category.supervisors.add(self.staff_user)
+        self.create_user('admin', 'admin_pw', is_staff=True, is_superuser=True)
+        self.client.login(username='admin', password='admin_pw')
+
+    def test_change_form_only_renders_selected_supervisors(self):
+        url = reverse('admin:aldryn_jobs_jobcategory_change',
+                      args=[self.default_category.pk])
+        response = self.client.get(url)
+        self.assertContains(
+            response, '<option value="{0}" selected="selected">staff</option>'
+            .format(self.staff_user.pk), html=True)
+        self.assertNotContains(
+            response, '<option value="{0}"'.format(self.super_user.pk))
+
+    def test_supervisors_autocomplete(self):
+        url = reverse('admin:aldryn_jobs_jobcategory_supervisors_autocomplete')
+        response = self.client.get(url, {'q': 'su'})
+        results = json.loads(response.content.decode('utf-8'))['results']
+        self.assertEqual(results, [
+            {'id': str(self.super_user.pk), 'text': 'super'}])
+
+
+class EstimatedCountPaginatorTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(EstimatedCountPaginatorTestCase, self).setUp()
+        self.opening = self.create_default_job_opening()
+        for idx in range(3):
+            JobApplication.objects.create(
+                job_opening=self.opening,
+                **self.make_new_values(self.application_values_raw, idx))
+
+    def test_small_results_are_counted_exactly(self):
+        paginator = EstimatedCountPaginator(JobApplication.objects.all(), 2)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.is_estimated)
+
+    def test_large_results_are_cached(self):
+        queryset = JobApplication.objects.all()
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.threshold = 3
+        self.assertEqual(paginator.count, 3)
+        JobApplication.objects.all()[0].delete()
+
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.threshold = 3
+        self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.is_estimated)
+
+
+class GapOrderingTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(GapOrderingTestCase, self).setUp()
+        self.openings = [self.create_new_job_opening(self.prepare_data(idx))
+                         for idx in range(4)]
+        self.set_ordering(1024, 2048, 3072, 4096)
+        self.create_user('admin', 'admin_pw', is_staff=True, is_superuser=True)
+        self.client.login(username='admin', password='admin_pw')
+
+    def set_ordering(self, *values):
+        for opening, value in zip(self.openings, values):
+            JobOpening.objects.filter(pk=opening.pk).update(ordering=value)
+
+    def get_ordered_pks(self):
+        return list(JobOpening.objects.order_by('ordering').values_list(
+            'pk', flat=True))
+
+    def move(self, startorder, endorder):
+        url = reverse('admin:aldryn_jobs_jobopening_sortable_update')
+        response = self.client.post(
+            url, {'startorder': startorder, 'endorder': endorder},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_move_updates_a_single_row(self):
+        first, second, third, fourth = self.openings
+        moved = self.move(4096, 1024)
+        self.assertEqual(moved, [{'pk': fourth.pk, 'order': 1536}])
+        self.assertEqual(self.get_ordered_pks(),
+                         [first.pk, fourth.pk, second.pk, third.pk])
+
+        moved = self.move(1024, 3072)
+        self.assertEqual(moved, [{'pk': first.pk, 'order': 4096}])
+        self.assertEqual(self.get_ordered_pks(),
+                         [fourth.pk, second.pk, third.pk, first.pk])
+
+    def test_move_without_gap_rebalances(self):
+        first, second, third, fourth = self.openings
+        self.set_ordering(1, 2, 3, 4)
+        moved = self.move(4, 1)
+        self.assertEqual(len(moved), 4)
+        self.assertEqual(self.get_ordered_pks(),
+                         [first.pk, fourth.pk, second.pk, third.pk])
+        # there is room again
+        self.assertEqual(len(self.move(1024, 2048)), 1)
+
+    def test_command_rebalances_crowded_ordering(self):
+        self.set_ordering(0, 0, 1, 5)
+        expected = [opening.pk for opening in self.openings]
+        stdout = StringIO()
+        call_command('rebalance_job_ordering', stdout=stdout)
+        self.assertIn('Rebalanced the ordering of 4 job openings',
+                      stdout.getvalue())
+        self.assertEqual(self.get_ordered_pks(), expected)
+        self.assertEqual(
+            sorted(JobOpening.objects.values_list('ordering', flat=True)),
+            [1024, 2048, 3072, 4096])
+
+        stdout = StringIO()
+        call_command('rebalance_job_ordering', stdout=stdout)
+        self.assertIn('The ordering of job openings has enough room',
+                      stdout.getvalue())
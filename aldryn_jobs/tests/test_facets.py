@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import override
+
+from ..facets import Facet, get_facet_choices
+from ..models import JobCategory, JobCategoriesPlugin, JobOpening
+from ..search import update_search_documents
+
+from .base import JobsBaseTestCase
+
+
+class FacetsTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(FacetsTestCase, self).setUp()
+        with override('en'):
+            self.finance = JobCategory.objects.create(
+                app_config=self.app_config, name='Finance', slug='finance')
+            JobOpening.objects.create(
+                title='Accountant', category=self.finance)
+            JobOpening.objects.create(
+                title='Controller', category=self.finance)
+            self.opening = self.create_default_job_opening()
+            self.url = self.page.get_absolute_url()
+
+    def get_choices(self, response):
+        facet, choices = response.context['facets'][0]
+        self.assertEqual(facet.name, 'category')
+        return choices
+
+    def test_facet_counts(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.get_choices(response), [
+            (self.default_category.slug, self.default_category.name, 1,
+             False),
+            ('finance', 'Finance', 2, False),
+        ])
+
+    def test_filter_by_category(self):
+        response = self.client.get(self.url, {'category': 'finance'})
+        self.assertContains(response, 'Accountant')
+        self.assertContains(response, 'Controller')
+        self.assertNotContains(response, self.opening.title)
+        # the counts ignore the facet's own selection
+        self.assertEqual(
+            [(count, selected)
+             for value, label, count, selected in self.get_choices(response)],
+            [(1, False), (2, True)])
+
+        response = self.client.get(
+            self.url, {'category': ['finance', self.default_category.slug]})
+        self.assertContains(response, 'Accountant')
+        self.assertContains(response, self.opening.title)
+
+    def test_facet_counts_follow_the_search_query(self):
+        update_search_documents(JobOpening.objects.all())
+        response = self.client.get(self.url, {'q': 'accountant'})
+        self.assertEqual(self.get_choices(response),
+                         [('finance', 'Finance', 1, False)])
+
+    def test_facet_counts_of_a_search_query_are_not_cached(self):
+        # search documents change without invalidating the cache
+        update_search_documents(JobOpening.objects.all())
+        self.client.get(self.url, {'q': 'accountant'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'q': 'accountant'})
+        self.assertTrue([query for query in queries.captured_queries
+                         if 'GROUP BY' in query['sql']])
+        self.assertEqual(self.get_choices(response),
+                         [('finance', 'Finance', 1, False)])
+
+    def test_facet_counts_are_cached_until_jobs_change(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'category': 'finance'})
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'GROUP BY' in query['sql']])
+
+        with override('en'):
+            JobOpening.objects.create(title='Auditor', category=self.finance)
+        response = self.client.get(self.url)
+        self.assertEqual(self.get_choices(response)[1][2], 3)
+
+    def test_field_facet(self):
+        facet = Facet()
+        facet.name = facet.field = 'category'
+        queryset = JobOpening.objects.all()
+        selected = {'category': [str(self.finance.pk)]}
+        self.assertEqual(
+            get_facet_choices([facet], queryset, selected,
+                              self.app_config.namespace, 'en'),
+            [(facet, [(str(self.default_category.pk),
+                       str(self.default_category.pk), 1, False),
+                      (str(self.finance.pk), str(self.finance.pk), 2,
+                       True)])])
+        self.assertEqual(
+            facet.filter(queryset, selected['category'], 'en').count(), 2)
+
+    def test_categories_plugin_counts_with_one_query(self):
+        JobCategory.objects.create(app_config=self.app_config, name='Empty')
+        plugin = JobCategoriesPlugin(app_config=self.app_config)
+        with self.assertNumQueries(2):
+            categories = list(plugin.categories)
+        self.assertEqual(
+            [(category.pk, category.opening_count) for category in categories],
+            [(self.default_category.pk, 1), (self.finance.pk, 2)])
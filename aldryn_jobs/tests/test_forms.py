@@ -1,6 +1,10 @@
+from django.forms.models import modelform_factory
+
 from ..cms_appconfig import JobsConfig
-from ..models import JobCategory
-from ..forms import JobCategoryAdminForm, JobOpeningAdminForm
+from ..models import JobCategory, JobListPlugin
+from ..forms import (
+    JobCategoryAdminForm, JobListPluginForm, JobOpeningAdminForm)
+from ..utils import get_apphooked_namespaces
 
 from .base import JobsBaseTestCase
 
@@ -205,3 +209,33 @@ class JobOpeningAdminFormTestCase(JobsBaseTestCase):
                          data['title'])
         self.assertGreater(len(new_opening.slug), 0)
         self.assertEqual(new_opening.category, self.default_category)
+
+    def test_category_choices_are_grouped_by_app_config(self):
+        other_config = JobsConfig.objects.create(namespace='other_config')
+        other_category = JobCategory.objects.create(
+            name='Other category', app_config=other_config)
+        form = JobOpeningAdminForm()
+        with self.assertNumQueries(2):
+            form['category'].as_widget()
+        choices = [choice for choice in form.fields['category'].widget.choices]
+        self.assertEqual(choices, [
+            ('', form.fields['category'].empty_label),
+            (str(self.app_config), [
+                (self.default_category.pk, str(self.default_category))]),
+            (str(other_config), [(other_category.pk, 'Other category')]),
+        ])
+
+
+class AppConfigPluginFormTestCase(JobsBaseTestCase):
+
+    def test_only_apphooked_configs_are_available(self):
+        JobsConfig.objects.create(namespace='other_config')
+        form_class = modelform_factory(
+            JobListPlugin, form=JobListPluginForm, fields=['app_config'])
+        get_apphooked_namespaces()
+        with self.assertNumQueries(1):
+            form = form_class()
+        self.assertEqual(list(form.fields['app_config'].queryset),
+                         [self.app_config])
+        self.assertIsNone(form.fields['app_config'].empty_label)
+        self.assertIn('other_config', form.fields['app_config'].help_text)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+
+from reversion.models import Revision
+
+from ..models import JobCategory, JobOpening
+from ..ordering import ORDERING_GAP
+
+from .base import JobsBaseTestCase
+
+
+class ImportFileTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(ImportFileTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(ImportFileTestCase, self).tearDown()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with io.open(path, 'w', encoding='utf-8') as fileobj:
+            fileobj.write(content)
+        return path
+
+
+class ImportJobOpeningsTestCase(ImportFileTestCase):
+
+    def call_import(self, path):
+        out = StringIO()
+        call_command('import_job_openings', path, stdout=out)
+        return out.getvalue()
+
+    def test_import_json_lines(self):
+        category_name = self.default_category_values['en']['name']
+        records = [
+            {'app_config': self.app_config.namespace,
+             'category': category_name,
+             'title': {'en': 'Software Engineer', 'de': 'Entwickler'},
+             'content_en': '<p>Write code.</p>'},
+            {'app_config': self.app_config.namespace,
+             'category': {'en': 'Sales'},
+             'title_en': 'Software Engineer',
+             'is_active': False,
+             'publication_start': '2016-01-15'},
+        ]
+        path = self.write('openings.json', '\n'.join(
+            json.dumps(record) for record in records))
+        revisions = Revision.objects.count()
+
+        output = self.call_import(path)
+
+        self.assertIn('Imported 2 job opening(s) and created 1 category',
+                      output)
+        first, second = JobOpening.objects.order_by('pk')
+        self.assertEqual(first.category, self.default_category)
+        self.assertEqual(first.safe_translation_getter(
+            'slug', language_code='en'), 'software-engineer')
+        self.assertEqual(first.safe_translation_getter(
+            'title', language_code='de'), 'Entwickler')
+        self.assertEqual(second.safe_translation_getter(
+            'slug', language_code='en'), 'software-engineer-1')
+        self.assertEqual(second.category.safe_translation_getter('name'),
+                         'Sales')
+        self.assertFalse(second.is_active)
+        self.assertEqual(second.publication_start.year, 2016)
+        plugin = first.content.get_plugins('en').get()
+        self.assertIn('Write code.',
+                      plugin.get_plugin_instance()[0].body)
+        self.assertFalse(second.content.get_plugins().exists())
+        self.assertEqual(Revision.objects.count(), revisions + 1)
+        revision = Revision.objects.latest('pk')
+        self.assertEqual(
+            revision.version_set.filter(
+                content_type__model='jobopening').count(), 2)
+
+    def test_import_csv(self):
+        path = self.write('openings.csv', (
+            'app_config,category_en,title_en,title_de,lead_in_en\n'
+            '{0},{1},Designer,Gestalter,Design things\n'.format(
+                self.app_config.namespace,
+                self.default_category_values['en']['name'])))
+
+        self.call_import(path)
+
+        opening = JobOpening.objects.get()
+        self.assertEqual(opening.safe_translation_getter(
+            'lead_in', language_code='en'), 'Design things')
+        self.assertEqual(opening.safe_translation_getter(
+            'slug', language_code='de'), 'gestalter')
+        self.assertEqual(JobCategory.objects.count(), 1)
+
+    def test_imported_openings_can_be_reordered(self):
+        existing = self.create_default_job_opening()
+        JobOpening.objects.filter(pk=existing.pk).update(ordering=5)
+        path = self.write('openings.csv', (
+            'app_config,category_en,title_en\n'
+            '{0},{1},Designer\n'
+            '{0},{1},Writer\n'.format(
+                self.app_config.namespace,
+                self.default_category_values['en']['name'])))
+        self.call_import(path)
+
+        designer, writer = JobOpening.objects.exclude(
+            pk=existing.pk).order_by('pk')
+        self.assertEqual((designer.ordering, writer.ordering),
+                         (5 + ORDERING_GAP, 5 + 2 * ORDERING_GAP))
+
+        # move the writer before the designer in the admin
+        self.create_user('admin', 'admin_pw', is_staff=True,
+                         is_superuser=True)
+        self.client.login(username='admin', password='admin_pw')
+        response = self.client.post(
+            reverse('admin:aldryn_jobs_jobopening_sortable_update'),
+            {'startorder': writer.ordering, 'endorder': 5},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(
+            json.loads(response.content.decode('utf-8')),
+            [{'pk': writer.pk, 'order': 5 + ORDERING_GAP // 2}])
+        self.assertEqual(
+            list(JobOpening.objects.order_by('ordering').values_list(
+                'pk', flat=True)),
+            [existing.pk, writer.pk, designer.pk])
+
+    def test_invalid_record_rolls_back(self):
+        namespace = self.app_config.namespace
+        path = self.write('openings.json', '\n'.join([
+            json.dumps({'app_config': namespace, 'category': 'Sales',
+                        'title': 'Designer'}),
+            json.dumps({'app_config': namespace, 'category': 'Sales'}),
+        ]))
+        with self.assertRaisesRegexp(CommandError, 'Record 2'):
+            self.call_import(path)
+        self.assertFalse(JobOpening.objects.exists())
+        self.assertEqual(JobCategory.objects.count(), 1)
+
+
+class SyncJobOpeningsTestCase(ImportFileTestCase):
+
+    def write_records(self, records):
+        return self.write('openings.json', '\n'.join(
+            json.dumps(dict(record, app_config=self.app_config.namespace,
+                            category='Engineering'))
+            for record in records))
+
+    def call_sync(self, path, *args):
+        out = StringIO()
+        call_command('sync_job_openings', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_sync(self):
+        records = [
+            {'external_id': 'ats-1', 'title': 'Software Engineer'},
+            {'external_id': 'ats-2', 'title': 'Designer'},
+        ]
+        output = self.call_sync(self.write_records(records))
+        self.assertIn('Created 2, updated 0', output)
+        opening = JobOpening.objects.get(external_id='ats-1')
+        slug = opening.safe_translation_getter('slug', language_code='en')
+
+        revisions = Revision.objects.count()
+        path = self.write_records(records)
+        with CaptureQueriesContext(connection) as queries:
+            output = self.call_sync(path)
+        self.assertIn('skipped 2 unchanged', output)
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+        self.assertEqual(Revision.objects.count(), revisions)
+
+        records[0]['title'] = 'Senior Software Engineer'
+        output = self.call_sync(self.write_records(records[:1]),
+                                '--deactivate-missing')
+        self.assertIn('updated 1, deactivated 1', output)
+        opening = JobOpening.objects.get(external_id='ats-1')
+        self.assertEqual(opening.safe_translation_getter(
+            'title', language_code='en'), 'Senior Software Engineer')
+        self.assertEqual(opening.safe_translation_getter(
+            'slug', language_code='en'), slug)
+        self.assertFalse(
+            JobOpening.objects.get(external_id='ats-2').is_active)
+        self.assertEqual(Revision.objects.count(), revisions + 1)
+
+    def test_sync_requires_external_id(self):
+        with self.assertRaisesRegexp(CommandError, 'Record 1'):
+            self.call_sync(self.write_records([{'title': 'Designer'}]))
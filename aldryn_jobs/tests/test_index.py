@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import sys
+import types
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from ..management.commands.update_job_openings_index import (
+    WATERMARK,
+    Command,
+)
+from ..models import DeletedJobOpening, JobOpening, Watermark
+
+from .base import JobsBaseTestCase
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class FakeBackend(object):
+    """Records what a haystack backend is asked to index and remove."""
+
+    def __init__(self):
+        self.updated = []
+        self.removed = []
+
+    def update(self, index, objects):
+        self.updated.append(sorted(obj.pk for obj in objects))
+
+    def remove(self, identifier):
+        self.removed.append(identifier)
+
+
+class FakeIndex(object):
+
+    def index_queryset(self, using=None):
+        return JobOpening.objects.active()
+
+
+class FakeConnection(object):
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_unified_index(self):
+        return self
+
+    def get_index(self, model):
+        return FakeIndex()
+
+    def get_backend(self):
+        return self.backend
+
+
+class FakePool(object):
+    """
+    Runs the tasks of a multiprocessing pool in this process, as forked
+    workers would not see the test database.
+    """
+    instances = []
+
+    def __init__(self, processes):
+        self.processes = processes
+        self.tasks = []
+        self.joined = False
+        self.instances.append(self)
+
+    def imap_unordered(self, func, tasks):
+        self.tasks = list(tasks)
+        return reversed([func(task) for task in self.tasks])
+
+    def close(self):
+        pass
+
+    def join(self):
+        self.joined = True
+
+
+def fake_haystack(backend):
+    """
+    Returns a patch of sys.modules providing a haystack package whose only
+    connection sends to `backend`.
+    """
+    haystack = types.ModuleType(str('haystack'))
+    connections = type(str('ConnectionHandler'), (dict,), {
+        'connections_info': {'default': {}}})
+    haystack.connections = connections(default=FakeConnection(backend))
+    exceptions = types.ModuleType(str('haystack.exceptions'))
+    exceptions.NotHandled = type(str('NotHandled'), (Exception,), {})
+    return mock.patch.dict(sys.modules, {
+        'haystack': haystack, 'haystack.exceptions': exceptions})
+
+
+class UpdateIndexTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(UpdateIndexTestCase, self).setUp()
+        self.opening = self.create_default_job_opening()
+        self.run_command()
+
+    def run_command(self, **options):
+        out = StringIO()
+        call_command('update_job_openings_index', stdout=out, **options)
+        return out.getvalue()
+
+    def test_openings_committed_after_a_run_are_not_missed(self):
+        # saved before the last run read its window, committed after it
+        watermark = Watermark.objects.get_value(WATERMARK)
+        JobOpening.objects.filter(pk=self.opening.pk).update(
+            modified=watermark - timedelta(seconds=10))
+        self.assertIn('search documents: updated 1', self.run_command())
+        # without overlap it would be left out
+        watermark = Watermark.objects.get_value(WATERMARK)
+        JobOpening.objects.filter(pk=self.opening.pk).update(
+            modified=watermark - timedelta(seconds=10))
+        self.assertNotIn('updated 1', self.run_command(margin=0))
+
+    def test_deleted_openings_are_removed(self):
+        pk = self.opening.pk
+        self.opening.delete()
+        self.assertTrue(DeletedJobOpening.objects.filter(
+            job_opening_id=pk).exists())
+        self.assertIn('search documents: updated 0 and removed 1',
+                      self.run_command())
+        # pruned once it is before the overlap of the next run
+        DeletedJobOpening.objects.update(
+            deleted=timezone.now() - timedelta(hours=1))
+        self.run_command()
+        self.assertFalse(DeletedJobOpening.objects.exists())
+
+
+class UpdateHaystackIndexTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(UpdateHaystackIndexTestCase, self).setUp()
+        self.openings = [self.create_new_job_opening(self.prepare_data(idx))
+                         for idx in range(3)]
+        self.backend = FakeBackend()
+        patch = fake_haystack(self.backend)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def run_command(self, **options):
+        out = StringIO()
+        call_command('update_job_openings_index', stdout=out, **options)
+        self.backend.updated, updated = [], self.backend.updated
+        self.backend.removed, removed = [], self.backend.removed
+        return out.getvalue(), updated, removed
+
+    def test_all_openings_are_sent_in_batches(self):
+        out, updated, removed = self.run_command(all=True, batch_size=2)
+        pks = sorted(opening.pk for opening in self.openings)
+        self.assertEqual(updated, [pks[:2], pks[2:]])
+        self.assertEqual(removed, [])
+        self.assertIn('default: updated 3 and removed 0', out)
+
+    def test_only_changed_openings_are_sent(self):
+        self.run_command()
+        # the watermark is kept in the database
+        cache.clear()
+        out, updated, removed = self.run_command(margin=0)
+        self.assertEqual(updated, [])
+
+        opening = self.openings[1]
+        opening.save()
+        out, updated, removed = self.run_command(margin=0)
+        self.assertEqual(updated, [[opening.pk]])
+
+    def test_watermark_is_kept_between_runs(self):
+        before = timezone.now()
+        self.run_command()
+        watermark = Watermark.objects.get_value(WATERMARK)
+        self.assertGreaterEqual(watermark, before)
+        self.assertLessEqual(watermark, timezone.now())
+
+        # --since does not move the watermark
+        self.run_command(since=before.isoformat())
+        self.assertEqual(Watermark.objects.get_value(WATERMARK), watermark)
+
+        # --delay leaves the last seconds for the next run
+        self.run_command(delay=60)
+        self.assertLessEqual(Watermark.objects.get_value(WATERMARK),
+                             timezone.now() - timedelta(seconds=60))
+
+    def test_deactivated_and_deleted_openings_are_removed(self):
+        self.run_command()
+        deactivated, deleted = self.openings[:2]
+        deactivated.is_active = False
+        deactivated.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+
+        out, updated, removed = self.run_command(margin=0)
+        self.assertEqual(updated, [])
+        self.assertEqual(sorted(removed), sorted(
+            'aldryn_jobs.jobopening.{0}'.format(pk)
+            for pk in (deactivated.pk, deleted_pk)))
+        self.assertIn('default: updated 0 and removed 2', out)
+
+    def test_work_is_split_per_connection_and_batch(self):
+        tasks = Command().get_tasks(
+            [1, 2, 3, 4, 5], [None, 'default'], {'batch_size': 2})
+        self.assertEqual(tasks, [
+            (None, [1, 2]), (None, [3, 4]), (None, [5]),
+            ('default', [1, 2]), ('default', [3, 4]), ('default', [5]),
+        ])
+        self.assertEqual(Command().get_tasks([], [None], {'batch_size': 2}),
+                         [])
+
+    def test_batches_are_handed_to_worker_processes(self):
+        FakePool.instances = []
+        module = 'aldryn_jobs.management.commands.update_job_openings_index'
+        with mock.patch(module + '.Pool', FakePool), \
+                mock.patch(module + '.db_connections') as db_connections:
+            out, updated, removed = self.run_command(
+                all=True, batch_size=2, workers=3)
+        pool, = FakePool.instances
+        self.assertEqual(pool.processes, 3)
+        self.assertTrue(pool.joined)
+        self.assertTrue(db_connections.close_all.called)
+        pks = sorted(opening.pk for opening in self.openings)
+        self.assertEqual(pool.tasks, [
+            (None, pks[:2]), (None, pks[2:]),
+            ('default', pks[:2]), ('default', pks[2:]),
+        ])
+        # the results of all workers are added up per connection
+        self.assertIn('search documents: updated 3 and removed 0', out)
+        self.assertIn('default: updated 3 and removed 0', out)
+
+    def test_batches_are_handled_in_process_with_one_worker(self):
+        FakePool.instances = []
+        module = 'aldryn_jobs.management.commands.update_job_openings_index'
+        with mock.patch(module + '.Pool', FakePool):
+            out, updated, removed = self.run_command(
+                all=True, batch_size=2, workers=1)
+        self.assertEqual(FakePool.instances, [])
+        self.assertEqual(len(updated), 2)
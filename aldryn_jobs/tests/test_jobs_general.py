@@ -1,21 +1,41 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from django.utils.translation import override
 from parler.utils.context import switch_language
 
 from cms import api
 from cms.models import Placeholder
+from cms.signals import urls_need_reloading
 from cms.utils import get_cms_setting
 from cms.utils.i18n import force_language
 from cms.test_utils.testcases import CMSTestCase
 
 from ..models import JobCategory, JobOpening
 from ..cms_appconfig import JobsConfig
-from ..utils import namespace_is_apphooked
+from ..menu import (
+    MENU_CACHE_TIMEOUT,
+    JobCategoryOpeningMenu,
+    JobOpeningMenu,
+)
+from .. import utils
+from ..utils import (
+    _apphooked_namespaces, get_apphooked_namespaces, namespace_is_apphooked,
+)
 
 from .base import JobsBaseTestCase, tz_datetime
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 
 class JobsAddTest(JobsBaseTestCase):
 
@@ -50,6 +70,97 @@ class JobsAddTest(JobsBaseTestCase):
             title=title, category=self.default_category)
         self.assertIn(opening, self.default_category.jobs.all())
 
+    def test_job_opening_slugs_are_unique_per_app_config(self):
+        """
+        Openings with the same title get numbered slugs within an app config,
+        while another app config may reuse the plain slug.
+        """
+        slugs = [
+            JobOpening.objects.create(
+                title='Software Engineer', category=self.default_category).slug
+            for _ in range(3)
+        ]
+        self.assertEqual(slugs, [
+            'software-engineer', 'software-engineer-1', 'software-engineer-2'])
+
+        other_config = JobsConfig.objects.create(namespace='other_jobs')
+        other_category = JobCategory.objects.create(
+            name='Other', app_config=other_config)
+        opening = JobOpening.objects.create(
+            title='Software Engineer', category=other_category)
+        self.assertEqual(opening.slug, 'software-engineer')
+
+    def test_new_slug_takes_one_query(self):
+        for _ in range(5):
+            JobOpening.objects.create(
+                title='Software Engineer', category=self.default_category)
+        opening = JobOpening(category=self.default_category)
+        opening.set_current_language(self.language)
+        opening.title = 'Software Engineer'
+        with self.assertNumQueries(1):
+            slug = opening.make_new_slug()
+        self.assertEqual(slug, 'software-engineer-5')
+
+    def test_changes_of_content_and_translations_are_tracked(self):
+        opening = self.create_default_job_opening()
+        since = timezone.now()
+        self.assertFalse(JobOpening.objects.changed_since(since).exists())
+
+        api.add_plugin(opening.content, 'TextPlugin', 'en', body='New')
+        self.assertEqual(list(JobOpening.objects.changed_since(since)),
+                         [opening])
+
+        since = timezone.now()
+        opening.create_translation('de', title='Neu')
+        self.assertEqual(list(JobOpening.objects.changed_since(since)),
+                         [opening])
+        # edits after the end of the window are left for the next one
+        self.assertFalse(JobOpening.objects.changed_since(
+            since - timedelta(hours=1), until=since).exists())
+
+    def test_plugins_outside_job_content_do_not_touch_openings(self):
+        opening = self.create_default_job_opening()
+        placeholder = self.page.placeholders.all()[0]
+        with CaptureQueriesContext(connection) as queries:
+            api.add_plugin(placeholder, 'TextPlugin', 'en', body='Page')
+        updates = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertFalse([sql for sql in updates
+                          if JobOpening._meta.db_table in sql])
+        self.assertEqual(JobOpening.objects.get(pk=opening.pk).modified,
+                         opening.modified)
+
+    def test_saving_an_opening_does_not_touch_it_again(self):
+        opening = self.create_default_job_opening(translated=True)
+        for language in ('en', 'de'):
+            opening.set_current_language(language)
+            opening.title = 'Changed {0}'.format(language)
+        with CaptureQueriesContext(connection) as queries:
+            opening.save()
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'SET "modified"' in query['sql']])
+
+    def test_openings_are_touched_once_per_transaction(self):
+        opening = self.create_default_job_opening(translated=True)
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                for translation in opening.translations.all():
+                    translation.title = 'Changed'
+                    translation.save()
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if 'SET "modified"' in query['sql']]), 1)
+        self.assertGreater(JobOpening.objects.get(pk=opening.pk).modified,
+                           opening.modified)
+
+    def test_publication_changes_are_tracked(self):
+        opening = self.create_default_job_opening()
+        since = timezone.now()
+        JobOpening.objects.filter(pk=opening.pk).update(
+            publication_end=since + timedelta(hours=1))
+        self.assertFalse(JobOpening.objects.changed_since(since).exists())
+        self.assertTrue(JobOpening.objects.changed_since(
+            since, until=since + timedelta(hours=2)).exists())
+
     def test_add_opening_list_plugin_api(self):
         """
         We add an opening to the Plugin and look it up
@@ -96,6 +207,110 @@ class JobApphookTest(JobsBaseTestCase):
         self.root_page_urls = self.get_root_page_urls()
         self.apphook_urls = self.get_apphook_urls()
 
+    def test_apphooked_namespaces_are_cached(self):
+        with override('en'):
+            namespaces = get_apphooked_namespaces()
+            self.assertIn(self.app_config.namespace, namespaces)
+            self.assertTrue(namespace_is_apphooked(self.app_config.namespace))
+            self.assertFalse(namespace_is_apphooked('not_apphooked'))
+            self.assertIs(get_apphooked_namespaces(), namespaces)
+            urls_need_reloading.send(sender=None)
+            self.assertIsNot(get_apphooked_namespaces(), namespaces)
+            self.assertEqual(get_apphooked_namespaces(), namespaces)
+
+    def test_apphooked_namespaces_are_shared_between_processes(self):
+        with override('en'):
+            namespaces = get_apphooked_namespaces()
+            # another process, which has its own resolver, finds them in
+            # the shared cache without reversing any URLs
+            _apphooked_namespaces[:] = [None, {}]
+            with mock.patch('aldryn_jobs.utils.reverse',
+                            wraps=utils.reverse) as reverse_mock:
+                self.assertEqual(get_apphooked_namespaces(), namespaces)
+            self.assertFalse(reverse_mock.called)
+
+            # publishing a page rebuilds them
+            self.page.publish('en')
+            _apphooked_namespaces[:] = [None, {}]
+            with mock.patch('aldryn_jobs.utils.reverse',
+                            wraps=utils.reverse) as reverse_mock:
+                get_apphooked_namespaces()
+            self.assertTrue(reverse_mock.called)
+
+    def test_menu_nodes_are_cached(self):
+        opening = self.create_default_job_opening()
+        menu = JobOpeningMenu(renderer=None)
+        menu.instance = self.page
+        request = RequestFactory().get('/')
+        request.LANGUAGE_CODE = 'en'
+
+        nodes = menu.get_nodes(request)
+        self.assertEqual([(node.id, node.get_absolute_url()) for node in nodes],
+                         [(opening.pk, opening.get_absolute_url('en'))])
+        with self.assertNumQueries(0):
+            cached_nodes = menu.get_nodes(request)
+        self.assertEqual([node.id for node in cached_nodes], [opening.pk])
+
+        opening.is_active = False
+        opening.save()
+        self.assertEqual(menu.get_nodes(request), [])
+
+    def test_cache_is_invalidated_once_per_transaction(self):
+        opening = self.create_default_job_opening(translated=True)
+        with mock.patch('aldryn_jobs.utils.menu_pool.clear') as clear:
+            try:
+                with transaction.atomic():
+                    opening.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            self.assertFalse(clear.called)
+
+            with transaction.atomic():
+                for language in ('en', 'de'):
+                    opening.set_current_language(language)
+                    opening.title = 'Changed {0}'.format(language)
+                    opening.save()
+                self.assertFalse(clear.called)
+            self.assertEqual(clear.call_count, 1)
+
+    def test_menu_cache_expires_on_publication_change(self):
+        self.create_default_job_opening()
+        namespace = self.app_config.namespace
+        menu = JobOpeningMenu(renderer=None)
+        self.assertEqual(menu.get_cache_timeout(namespace, 'en'),
+                         MENU_CACHE_TIMEOUT)
+        JobOpening.objects.update(
+            publication_end=timezone.now() + timedelta(seconds=30))
+        self.assertLessEqual(menu.get_cache_timeout(namespace, 'en'), 30)
+
+    def test_category_opening_menu_nests_openings(self):
+        other_category = JobCategory.objects.create(
+            name='Other', app_config=self.app_config)
+        openings = [
+            JobOpening.objects.create(title=title, category=category)
+            for title, category in [('First', self.default_category),
+                                    ('Second', other_category),
+                                    ('Third', self.default_category)]
+        ]
+        menu = JobCategoryOpeningMenu(renderer=None)
+        with self.assertNumQueries(4):
+            node_data = menu.get_node_data(self.app_config.namespace, 'en')
+        parents = dict((data[2], data[3] if len(data) > 3 else None)
+                       for data in node_data)
+        category_id = 'category-{0}'.format
+        opening_id = 'opening-{0}'.format
+        self.assertEqual(parents, {
+            category_id(self.default_category.pk): None,
+            category_id(other_category.pk): None,
+            opening_id(openings[0].pk): category_id(self.default_category.pk),
+            opening_id(openings[1].pk): category_id(other_category.pk),
+            opening_id(openings[2].pk): category_id(self.default_category.pk),
+        })
+        urls = [data[1] for data in node_data]
+        with override('en'):
+            self.assertIn(openings[1].get_absolute_url(), urls)
+
     def get_root_page_urls(self):
         """
         get root page urls for all languages.
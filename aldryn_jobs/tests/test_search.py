@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.utils.six import StringIO
+from django.utils.translation import override
+
+from cms import api
+
+from ..models import JobOpening, JobOpeningSearchDocument
+from ..search import (
+    FTS_TABLE,
+    get_placeholder_text,
+    get_request,
+    has_fts_table,
+    search_documents,
+    search_job_openings,
+    strip_tags,
+    update_search_documents,
+)
+
+from .base import JobsBaseTestCase
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class SearchTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(SearchTestCase, self).setUp()
+        self.opening = self.create_default_job_opening(translated=True)
+        self.other_opening = JobOpening.objects.create(
+            title='Accountant', category=self.default_category)
+
+    def update_documents(self):
+        return update_search_documents(JobOpening.objects.all())
+
+    def test_documents_contain_title_lead_in_and_content(self):
+        self.assertEqual(self.update_documents(), 2)
+        document = JobOpeningSearchDocument.objects.get(
+            job_opening=self.opening, language='en')
+        self.assertIn('Default job opening en', document.text)
+        self.assertIn('Default job for default people!', document.text)
+        self.assertIn('Awesome job details here EN', document.text)
+        self.assertNotIn('<p>', document.text)
+        self.assertEqual(
+            set(self.opening.search_documents.values_list(
+                'language', flat=True)),
+            set(['en', 'de']))
+
+    def test_placeholder_text_is_cached_until_plugins_change(self):
+        cache.clear()
+        placeholder = self.opening.content
+        request = get_request('en')
+
+        def get_text():
+            # the text of every rendered plugin is stripped of its tags
+            with mock.patch('aldryn_jobs.search.strip_tags',
+                            side_effect=strip_tags) as rendered:
+                text = get_placeholder_text(placeholder, 'en', request)
+            return text, rendered.call_count
+
+        self.assertEqual(get_text(), ('Awesome job details here EN', 1))
+        self.assertEqual(get_text(), ('Awesome job details here EN', 0))
+
+        plugin = api.add_plugin(placeholder, 'TextPlugin', 'en',
+                                body='<p>More details</p>')
+        self.assertEqual(
+            get_text(), ('Awesome job details here EN More details', 2))
+
+        plugin.body = '<p>Changed</p>'
+        plugin.save()
+        self.assertEqual(
+            get_text(), ('Awesome job details here EN Changed', 2))
+        self.assertEqual(get_placeholder_text(placeholder, 'de'), None)
+
+    def test_documents_of_removed_translations_are_deleted(self):
+        self.update_documents()
+        self.opening.translations.filter(language_code='de').delete()
+        self.update_documents()
+        self.assertEqual(
+            list(self.opening.search_documents.values_list(
+                'language', flat=True)),
+            ['en'])
+
+    def test_search_matches_all_words_as_prefixes(self):
+        self.update_documents()
+        self.assertEqual(
+            list(search_job_openings('awesome detail', 'en')),
+            [self.opening])
+        self.assertEqual(
+            list(search_job_openings('account', 'en')),
+            [self.other_opening])
+        self.assertFalse(search_job_openings('awesome account', 'en'))
+        self.assertFalse(search_job_openings('German', 'en'))
+        self.assertEqual(
+            list(search_job_openings('German', 'de')), [self.opening])
+        self.assertFalse(search_job_openings('', 'en'))
+
+    def test_search_follows_document_updates(self):
+        self.update_documents()
+        JobOpeningSearchDocument.objects.filter(
+            job_opening=self.other_opening).update(text='Bookkeeper')
+        self.assertFalse(search_job_openings('account', 'en'))
+        self.assertEqual(
+            list(search_job_openings('bookkeep', 'en')), [self.other_opening])
+
+    def test_documents_are_refreshed_on_save(self):
+        self.update_documents()
+        self.other_opening.title = 'Bookkeeper'
+        self.other_opening.save()
+        self.assertFalse(search_job_openings('account', 'en'))
+        self.assertEqual(
+            list(search_job_openings('bookkeep', 'en')), [self.other_opening])
+
+        # the content text is kept from the last update of the documents
+        self.opening.set_current_language('de')
+        self.opening.title = 'Neue Stelle'
+        self.opening.save()
+        self.assertEqual(self.opening.get_current_language(), 'de')
+        self.assertEqual(
+            list(search_job_openings('neue', 'de')), [self.opening])
+        self.assertEqual(
+            list(search_job_openings('awesome', 'en')), [self.opening])
+
+    def test_documents_of_new_openings_are_created_on_save(self):
+        with override('en'):
+            opening = JobOpening.objects.create(
+                title='Bookkeeper', category=self.default_category)
+        self.assertEqual(
+            list(search_job_openings('bookkeep', 'en')), [opening])
+
+    def test_sqlite_uses_fts_table(self):
+        if connection.vendor != 'sqlite' or not has_fts_table(connection):
+            self.skipTest('SQLite with FTS5 only')
+        self.assertIn(FTS_TABLE, str(
+            search_documents('account', 'en').query))
+
+    def test_list_view_filters_by_query(self):
+        self.update_documents()
+        with override('en'):
+            url = self.page.get_absolute_url()
+        response = self.client.get(url, {'q': 'accountant'})
+        self.assertContains(response, 'Accountant')
+        self.assertNotContains(response, 'Default job opening en')
+        self.assertEqual(response.context['query'], 'accountant')
+
+        response = self.client.get(url)
+        self.assertContains(response, 'Accountant')
+        self.assertContains(response, 'Default job opening en')
+
+    def test_update_command_refreshes_search_documents(self):
+        out = StringIO()
+        call_command('update_job_openings_index', all=True, stdout=out)
+        self.assertIn('search documents: updated 2', out.getvalue())
+        self.assertEqual(
+            list(search_job_openings('accountant', 'en')),
+            [self.other_opening])
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import posixpath
+
+from django.contrib.sitemaps.views import sitemap
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.management.base import CommandError
+from django.http import Http404
+from django.test import RequestFactory
+from django.utils.six import StringIO
+from django.utils.translation import override
+
+from ..models import JobCategory, JobOpening
+from ..sitemaps import JobOpeningCategoriesSitemap, JobOpeningSitemap
+from ..sitemaps.files import (
+    SITEMAP_DIRECTORY,
+    delete_generation,
+    get_generation,
+    get_generations,
+    get_storage,
+    gzip_content,
+    gunzip_content,
+)
+from ..sitemaps.views import sitemap_file
+
+from .base import JobsBaseTestCase
+
+
+class SitemapsTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(SitemapsTestCase, self).setUp()
+        self.opening = self.create_default_job_opening(translated=True)
+        with override('en'):
+            # neither listed
+            JobOpening.objects.create(title='Inactive', is_active=False,
+                                      category=self.default_category)
+            JobCategory.objects.create(app_config=self.app_config,
+                                       name='Empty')
+
+    def get_urls(self, sitemap):
+        return sitemap.get_urls(site=Site.objects.get_current())
+
+    def test_opening_translations_with_alternates(self):
+        with self.assertNumQueries(4):
+            urls = self.get_urls(JobOpeningSitemap())
+        locations = [
+            'http://example.com{0}'.format(
+                self.opening.get_absolute_url(language))
+            for language in ('en', 'de')]
+        self.assertEqual([url['location'] for url in urls], locations)
+        for url in urls:
+            self.assertEqual(url['lastmod'], self.opening.modified)
+            self.assertEqual(url['alternates'],
+                             list(zip(('en', 'de'), locations)))
+
+    def test_categories_with_active_openings(self):
+        urls = self.get_urls(JobOpeningCategoriesSitemap())
+        self.assertEqual(
+            [url['location'] for url in urls],
+            ['http://example.com{0}'.format(
+                self.default_category.get_absolute_url(language))
+             for language in ('en', 'de')])
+        self.assertEqual(urls[0]['lastmod'], self.opening.modified)
+
+    def test_items_are_cached_until_jobs_change(self):
+        self.get_urls(JobOpeningSitemap())
+        with self.assertNumQueries(0):
+            self.get_urls(JobOpeningSitemap())
+        self.opening.is_active = False
+        self.opening.save()
+        self.assertEqual(self.get_urls(JobOpeningSitemap()), [])
+
+    def test_items_are_cached_in_chunks(self):
+        sitemap = JobOpeningSitemap()
+        sitemap.cache_chunk_size = 1
+        sitemap.limit = 1
+        urls = self.get_urls(sitemap)
+        self.assertEqual(len(urls), 1)
+        self.assertEqual(len(sitemap.items()), 2)
+        self.assertEqual(sitemap.paginator.count, 2)
+        with self.assertNumQueries(0):
+            second_page = sitemap.get_urls(
+                page=2, site=Site.objects.get_current())
+        self.assertEqual(
+            [url['location'] for url in second_page],
+            ['http://example.com{0}'.format(
+                self.opening.get_absolute_url('de'))])
+
+        # a chunk evicted from the cache is built again
+        cache_key = sitemap.items().cache_key
+        cache.delete('{0}:1'.format(cache_key))
+        sitemap = JobOpeningSitemap()
+        sitemap.cache_chunk_size = 1
+        self.assertEqual(
+            [url['location'] for url in self.get_urls(sitemap)],
+            ['http://example.com{0}'.format(
+                self.opening.get_absolute_url(language))
+             for language in ('en', 'de')])
+
+    def test_sitemap_template_lists_alternates(self):
+        request = RequestFactory().get('/sitemap.xml')
+        response = sitemap(request, {'jobs': JobOpeningSitemap},
+                           template_name='aldryn_jobs/sitemap.xml')
+        response.render()
+        self.assertContains(
+            response, '<xhtml:link rel="alternate" hreflang="de" '
+                      'href="http://example.com{0}"/>'.format(
+                          self.opening.get_absolute_url('de')))
+
+
+class SitemapFilesTestCase(JobsBaseTestCase):
+
+    def setUp(self):
+        super(SitemapFilesTestCase, self).setUp()
+        self.opening = self.create_default_job_opening(translated=True)
+
+    def tearDown(self):
+        storage = get_storage()
+        for directory in get_generations(storage):
+            delete_generation(storage, directory)
+        super(SitemapFilesTestCase, self).tearDown()
+
+    def generate(self, **options):
+        out = StringIO()
+        call_command('generate_job_sitemaps', base_path='/sitemaps/',
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def get_file(self, filename, **headers):
+        request = RequestFactory().get('/sitemaps/' + filename, **headers)
+        return sitemap_file(request, filename)
+
+    def test_generated_files_are_served(self):
+        self.assertIn('Wrote 3 sitemap file(s).', self.generate())
+
+        response = self.get_file('sitemap.xml')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        for section in ('jobs', 'job-categories'):
+            self.assertContains(
+                response,
+                'http://example.com/sitemaps/sitemap-{0}-1.xml'.format(
+                    section))
+
+        response = self.get_file('sitemap-jobs-1.xml',
+                                 HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(self.opening.get_absolute_url('de').encode('utf-8'),
+                      gunzip_content(response.content))
+
+        with self.assertRaises(Http404):
+            self.get_file('sitemap-jobs-2.xml')
+
+    def test_files_are_only_written_when_jobs_change(self):
+        self.generate(if_changed=True)
+        # the time of the last run is kept in the database
+        cache.clear()
+        self.assertIn('up to date', self.generate(if_changed=True))
+        self.opening.save()
+        self.assertIn('Wrote 3', self.generate(if_changed=True))
+        self.default_category.name = 'Renamed'
+        self.default_category.save()
+        self.assertIn('Wrote 3', self.generate(if_changed=True))
+        self.assertIn('up to date', self.generate(if_changed=True))
+        self.generate()
+        # the previous generation is kept for requests still reading it
+        self.assertEqual(len(get_generations(get_storage())), 2)
+
+    def test_base_path_is_required_without_urls(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_job_sitemaps', stdout=StringIO())
+
+    def test_newest_generation_is_served_at_once(self):
+        self.generate()
+        self.assertContains(self.get_file('sitemap.xml'), 'sitemap-jobs-1')
+        # a generation completed by another process is served right away
+        storage = get_storage()
+        newer = posixpath.join(SITEMAP_DIRECTORY, '99991231235959999999')
+        storage.save(posixpath.join(newer, 'sitemap.xml.gz'),
+                     gzip_content('<sitemapindex/>'))
+        self.assertEqual(get_generation(storage), newer)
+        self.assertEqual(self.get_file('sitemap.xml').content,
+                         b'<sitemapindex/>')
+
+    def test_other_directories_are_not_generations(self):
+        storage = get_storage()
+        other = posixpath.join(SITEMAP_DIRECTORY, 'zz-other')
+        storage.save(posixpath.join(other, 'keep.txt'), ContentFile(b'x'))
+        self.addCleanup(delete_generation, storage, other)
+        for idx in range(3):
+            self.generate()
+        self.assertNotIn(other, get_generations(storage))
+        self.assertTrue(storage.exists(posixpath.join(other, 'keep.txt')))
+        self.assertContains(self.get_file('sitemap.xml'), 'sitemap-jobs-1')
@@ -1,11 +1,37 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import time
 from os.path import splitext
 
-from django.core.urlresolvers import reverse, NoReverseMatch
+from django.core.cache import cache
+from django.core.urlresolvers import (
+    get_resolver, get_urlconf, reverse, NoReverseMatch)
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.encoding import force_text
 from django.utils.text import get_valid_filename as get_valid_filename_django
+from django.utils.translation import get_language
 from django.template.defaultfilters import slugify
 
+from cms.signals import post_publish, post_unpublish, urls_need_reloading
+from cms.utils.conf import get_cms_setting
+from menus.menu_pool import menu_pool
+
+# Cache key of the version that is part of the cache keys of all cached jobs
+# data, see get_cache_key() and invalidate_cache().
+CACHE_VERSION_KEY = 'aldryn_jobs:cache_version'
+
+# Cache key of the version that is part of the cache keys of the apphooked
+# namespaces shared between processes, see get_apphooked_namespaces().
+APPHOOKS_VERSION_KEY = 'aldryn_jobs:apphooks_version'
+
+# Seconds the shared apphooked namespaces are cached, which bounds how long a
+# process that has not reloaded its apphooks yet can keep a stale entry.
+APPHOOKS_CACHE_TIMEOUT = 60 * 60
+
+# (resolver, {language: namespaces}) of the last get_apphooked_namespaces()
+_apphooked_namespaces = [None, {}]
+
 
 def get_valid_filename(s):
     """
@@ -22,15 +48,137 @@ def get_valid_filename(s):
         return "%s" % (filename,)
 
 
-def namespace_is_apphooked(namespace):
+def get_apphooked_namespaces():
+    """
+    Returns the set of namespaces that reverse the jobs app's default view.
+    The set is cached per process for each URL resolver and language (django
+    CMS swaps the resolver when it reloads the apphooks), and in the cache
+    shared by all processes until the apphooks are reloaded or a page is
+    (un)published.
+    """
     # avoid circular import
     from .urls import DEFAULT_VIEW
+    resolver = get_resolver(get_urlconf())
+    language = get_language()
+    cached_resolver, namespaces = _apphooked_namespaces
+    if cached_resolver is not resolver:
+        namespaces = {}
+        _apphooked_namespaces[:] = [resolver, namespaces]
+    if language not in namespaces:
+        cache_key = ':'.join(force_text(part) for part in (
+            'aldryn_jobs', 'apphooked_namespaces',
+            get_cache_version(APPHOOKS_VERSION_KEY), language))
+        apphooked = cache.get(cache_key)
+        if apphooked is None:
+            apphooked = []
+            candidates = set(resolver.namespace_dict) | set(resolver.app_dict)
+            for namespace in candidates:
+                try:
+                    reverse('{0}:{1}'.format(namespace, DEFAULT_VIEW))
+                except NoReverseMatch:
+                    continue
+                apphooked.append(namespace)
+            cache.set(cache_key, apphooked, APPHOOKS_CACHE_TIMEOUT)
+        namespaces[language] = frozenset(apphooked)
+    return namespaces[language]
+
+
+@receiver(urls_need_reloading, dispatch_uid='aldryn_jobs_apphooked_namespaces')
+@receiver(post_publish, dispatch_uid='aldryn_jobs_apphooked_namespaces')
+@receiver(post_unpublish, dispatch_uid='aldryn_jobs_apphooked_namespaces')
+def clear_apphooked_namespaces(**kwargs):
+    _apphooked_namespaces[:] = [None, {}]
+    increment_cache_version(APPHOOKS_VERSION_KEY)
+
+
+def get_cache_version(version_key):
+    """
+    Returns the version stored under `version_key`, which is part of cache
+    keys so they all expire when increment_cache_version() is called.
+    """
+    version = cache.get(version_key)
+    if version is None:
+        # Start from the current time rather than 1, so entries cached under
+        # a version that was evicted from the cache are not used again.
+        version = int(time.time())
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def increment_cache_version(version_key):
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, int(time.time()), None)
+
+
+def get_cache_key(*parts):
+    """
+    Returns a cache key for jobs data identified by `parts`. The keys change
+    (so all cached jobs data expires) whenever invalidate_cache() is called.
+    """
+    parts = ('aldryn_jobs', get_cache_version(CACHE_VERSION_KEY)) + parts
+    return ':'.join(force_text(part) for part in parts)
+
+
+def invalidate_cache():
+    """
+    Expires all cached jobs data, including the django CMS menus, which
+    contain the nodes of the jobs menus. Call it through on_commit_once()
+    when data is changed in a transaction, so requests running meanwhile
+    cannot cache the old data under the new version.
+    """
+    increment_cache_version(CACHE_VERSION_KEY)
+    menu_pool.clear(all=True)
+
+
+def on_commit_once(func, key, using=None):
+    """
+    Calls `func` once the current transaction is committed, only once
+    however often it is registered under `key` within that transaction.
+    Outside transactions, and on Django < 1.9, which has no commit hooks,
+    `func` is called right away.
+    """
+    connection = transaction.get_connection(using)
+    if not hasattr(transaction, 'on_commit') or not connection.in_atomic_block:
+        func()
+        return
+    # hooks of rolled back (savepoint) transactions are dropped from this list
+    for hook in connection.run_on_commit:
+        if getattr(hook[1], 'aldryn_jobs_key', None) == key:
+            return
+
+    def hook():
+        func()
+    hook.aldryn_jobs_key = key
+    transaction.on_commit(hook, using)
+
+
+def namespace_is_apphooked(namespace):
     """
     Check if provided namespace has an app-hooked page.
     Returns True or False.
     """
+    return namespace in get_apphooked_namespaces()
+
+
+def get_wizard_content_plugin():
+    """
+    Returns the plugin type and body field name django CMS uses for content
+    entered in the wizards.
+    """
+    try:
+        # CMS >= 3.3.x
+        content_plugin = get_cms_setting('PAGE_WIZARD_CONTENT_PLUGIN')
+    except KeyError:
+        # CMS <= 3.2.x
+        content_plugin = get_cms_setting('WIZARD_CONTENT_PLUGIN')
+
     try:
-        reverse('{0}:{1}'.format(namespace, DEFAULT_VIEW))
-    except NoReverseMatch:
-        return False
-    return True
+        # CMS >= 3.3.x
+        content_field = get_cms_setting('PAGE_WIZARD_CONTENT_PLUGIN_BODY')
+    except KeyError:
+        # CMS <= 3.2.x
+        content_field = get_cms_setting('WIZARD_CONTENT_PLUGIN_BODY')
+    return content_plugin, content_field
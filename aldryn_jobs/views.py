@@ -16,8 +16,10 @@ from menus.utils import set_language_changer
 from parler.views import TranslatableSlugMixin
 from reversion.revisions import revision_context_manager
 
+from .facets import CategoryFacet, get_facet_choices
 from .forms import JobApplicationForm
 from .models import JobCategory, JobOpening
+from .search import search_job_openings
 
 
 class JobsBaseMixin(object):
@@ -38,16 +40,60 @@ class JobsBaseMixin(object):
         # something is wrong, anyway do not fail with 500
         if self.config is None:
             return JobOpening.objects.none()
-        return (
+        queryset = (
             JobOpening.objects.active()
                               .namespace(self.config.namespace)
                               .language(self.language)
                               .active_translations(self.language)
                               .select_related('category')
         )
+        query = self.get_search_query()
+        if query:
+            queryset = search_job_openings(query, self.language, queryset)
+        return queryset
 
+    def get_search_query(self):
+        """Returns the full-text search query from the ``q`` GET parameter."""
+        return self.request.GET.get('q', '').strip()
 
-class JobOpeningList(JobsBaseMixin, AppConfigMixin, ListView):
+    def get_context_data(self, **kwargs):
+        context = super(JobsBaseMixin, self).get_context_data(**kwargs)
+        context['query'] = self.get_search_query()
+        return context
+
+
+class FacetsMixin(object):
+    """
+    Filters the openings by the values of `facets` given in the GET
+    parameters, and lists the values with their counts in the context.
+    """
+    facets = (CategoryFacet(),)
+
+    def get_queryset(self):
+        queryset = super(FacetsMixin, self).get_queryset()
+        # the facet counts are computed before any facet filter is applied
+        self.facet_queryset = queryset
+        self.selected_facets = dict(
+            (facet.name, facet.get_selected(self.request))
+            for facet in self.facets)
+        for facet in self.facets:
+            if self.selected_facets[facet.name]:
+                queryset = facet.filter(
+                    queryset, self.selected_facets[facet.name], self.language)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super(FacetsMixin, self).get_context_data(**kwargs)
+        if self.config is None:
+            context['facets'] = []
+        else:
+            context['facets'] = get_facet_choices(
+                self.facets, self.facet_queryset, self.selected_facets,
+                self.config.namespace, self.language, self.get_search_query())
+        return context
+
+
+class JobOpeningList(FacetsMixin, JobsBaseMixin, AppConfigMixin, ListView):
 
     def get_queryset(self):
         return super(JobOpeningList, self).get_queryset().order_by(
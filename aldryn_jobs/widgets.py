@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django import forms
+from django.template.loader import render_to_string
+from django.utils.encoding import force_text
+from django.utils.safestring import mark_safe
+
+
+class AutocompleteSelectMultiple(forms.SelectMultiple):
+    """
+    A multiple select for model choices that only renders the selected
+    objects. Further objects are searched for through the JSON endpoint at
+    `url`, see `admin.autocomplete_response`.
+    """
+    template_name = (
+        'admin/aldryn_jobs/widgets/autocomplete_select_multiple.html')
+
+    def __init__(self, url, attrs=None, choices=()):
+        super(AutocompleteSelectMultiple, self).__init__(attrs, choices)
+        self.url = url
+
+    def render(self, name, value, attrs=None, choices=()):
+        select = super(AutocompleteSelectMultiple, self).render(
+            name, value, attrs, choices)
+        return mark_safe(render_to_string(self.template_name, {
+            'select': select,
+            'url': self.url,
+        }))
+
+    def render_options(self, choices, selected_choices):
+        selected_choices = set(
+            force_text(value) for value in selected_choices if value)
+        if not selected_choices:
+            return ''
+        # self.choices is the ModelChoiceIterator of the field, only look up
+        # the selected objects instead of iterating all of them.
+        queryset = self.choices.queryset.filter(pk__in=selected_choices)
+        label_from_instance = self.choices.field.label_from_instance
+        return '\n'.join(
+            self.render_option(selected_choices, obj.pk,
+                               label_from_instance(obj))
+            for obj in queryset)
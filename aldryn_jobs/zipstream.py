@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import struct
+import time
+import zlib
+
+from django.utils.encoding import force_bytes
+
+LOCAL_FILE_HEADER = struct.Struct(str('<IHHHHHIIIHH'))
+DATA_DESCRIPTOR = struct.Struct(str('<IIII'))
+CENTRAL_DIRECTORY_HEADER = struct.Struct(str('<IHHHHHHIIIHHHHHII'))
+END_OF_CENTRAL_DIRECTORY = struct.Struct(str('<IHHHHIIH'))
+
+ZIP_VERSION = 20
+# Sizes are written after the data and file names are encoded in UTF-8.
+ZIP_FLAGS = 0x08 | 0x800
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+# Without ZIP64 extensions offsets and sizes are limited to 32 bits.
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+
+class ZipStream(object):
+    """
+    Writes a ZIP archive on the fly, without seeking and without keeping file
+    contents around, so it can be sent with a StreamingHttpResponse. Only a
+    small record per file is kept for the central directory.
+
+        archive = ZipStream()
+        for name, chunks in files:
+            for data in archive.add(name, chunks):
+                yield data
+        for data in archive.close():
+            yield data
+
+    Archives are limited to 4 GB and 65535 files (no ZIP64 support).
+    """
+
+    def __init__(self, compress=True):
+        self.method = ZIP_DEFLATED if compress else ZIP_STORED
+        self.offset = 0
+        self.entries = []
+
+    def _write(self, data):
+        self.offset += len(data)
+        if self.offset > ZIP_MAX_SIZE:
+            raise ValueError('ZIP archive exceeds 4 GB.')
+        return data
+
+    def add(self, name, chunks, date_time=None):
+        """
+        Yields the archive data for a file named `name` whose contents are the
+        byte strings produced by the iterable `chunks`.
+        """
+        if len(self.entries) >= ZIP_MAX_ENTRIES:
+            raise ValueError('Too many files for a ZIP archive.')
+        name = force_bytes(name)
+        dos_date, dos_time = self._get_dos_date_time(date_time)
+        header_offset = self.offset
+        yield self._write(LOCAL_FILE_HEADER.pack(
+            0x04034b50, ZIP_VERSION, ZIP_FLAGS, self.method, dos_time,
+            dos_date, 0, 0, 0, len(name), 0) + name)
+
+        crc, size, compressed_size = 0, 0, 0
+        if self.method == ZIP_DEFLATED:
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        for chunk in chunks:
+            chunk = force_bytes(chunk)
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if self.method == ZIP_DEFLATED:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            compressed_size += len(chunk)
+            yield self._write(chunk)
+        if self.method == ZIP_DEFLATED:
+            chunk = compressor.flush()
+            compressed_size += len(chunk)
+            yield self._write(chunk)
+
+        crc &= 0xFFFFFFFF
+        if size > ZIP_MAX_SIZE:
+            raise ValueError('File {0!r} exceeds 4 GB.'.format(name))
+        yield self._write(DATA_DESCRIPTOR.pack(
+            0x08074b50, crc, compressed_size, size))
+        self.entries.append((name, dos_date, dos_time, crc, compressed_size,
+                             size, header_offset))
+
+    def close(self):
+        """
+        Yields the central directory, which ends the archive.
+        """
+        directory_offset = self.offset
+        for (name, dos_date, dos_time, crc, compressed_size, size,
+                header_offset) in self.entries:
+            yield self._write(CENTRAL_DIRECTORY_HEADER.pack(
+                0x02014b50, ZIP_VERSION, ZIP_VERSION, ZIP_FLAGS, self.method,
+                dos_time, dos_date, crc, compressed_size, size, len(name),
+                0, 0, 0, 0, 0o600 << 16, header_offset) + name)
+        directory_size = self.offset - directory_offset
+        yield self._write(END_OF_CENTRAL_DIRECTORY.pack(
+            0x06054b50, 0, 0, len(self.entries), len(self.entries),
+            directory_size, directory_offset, 0))
+
+    def _get_dos_date_time(self, date_time):
+        if date_time is None:
+            date_time = time.localtime()[:6]
+        year, month, day, hour, minute, second = date_time[:6]
+        year = max(year, 1980)
+        dos_date = (year - 1980) << 9 | month << 5 | day
+        dos_time = hour << 11 | minute << 5 | second // 2
+        return dos_date, dos_time
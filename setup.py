@@ -23,7 +23,8 @@ REQUIREMENTS = [
     'aldryn-categories',
     'django-multiupload>=0.5.1',
     'django-sortedm2m>=1.2.2',
-    'django-admin-sortable2>=0.5.2',
+    # the gap ordering of the admin builds on the API of 0.6.4+
+    'django-admin-sortable2>=0.6.4,<0.7',
     'unidecode',
     'lxml',
     'pytz',